@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import io
+import json
+import os.path
+import random
+import resource
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from typing import Callable, List
+
+import daily
+from daily import Daily, FsDriver, SqliteDriver, UnsupportedOperationException
+
+DRIVERS = ["sqlite", "fs"]
+
+
+def generate_dates(years: int) -> List[str]:
+    end = date.today()
+    start = end - timedelta(days=365 * years)
+    return [(start + timedelta(days=i)).strftime(daily.DATE_FORMAT) for i in range((end - start).days + 1)]
+
+
+def populate(driver, dates: List[str], entries_per_day: int) -> None:
+    for daily_date in dates:
+        driver.add_entries(daily_date, [f"worked on ticket {daily_date}-{n}" for n in range(entries_per_day)])
+
+
+def peak_rss_kb() -> int:
+    # ru_maxrss is reported in kilobytes on linux but in bytes on macos
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak // 1024
+    return peak
+
+
+def percentile(latencies: List[float], p: float) -> float:
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, round(p * (len(ordered) - 1)))]
+
+
+def measure(func: Callable[[int], object], iterations: int) -> dict:
+    latencies = []
+    try:
+        for i in range(iterations):
+            start = time.perf_counter()
+            func(i)
+            latencies.append(time.perf_counter() - start)
+    except UnsupportedOperationException:
+        return {"unsupported": True}
+
+    total = sum(latencies)
+    return {
+        "ops": iterations,
+        "ops_per_sec": iterations / total if total else None,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def build_driver(name: str, workdir: str):
+    if name == "sqlite":
+        return SqliteDriver(os.path.join(workdir, "daily.db"))
+    # FsDriver announces the directory it creates, keep stdout clean for the json report
+    with contextlib.redirect_stdout(sys.stderr):
+        return FsDriver(os.path.join(workdir, "daily"))
+
+
+def run_main(argv: List[str]) -> None:
+    old_argv = sys.argv
+    sys.argv = ["daily", "--no-daemon"] + argv
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            daily.main()
+    finally:
+        sys.argv = old_argv
+
+
+def bench_driver(name: str, args: argparse.Namespace) -> dict:
+    rnd = random.Random(args.seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        driver = build_driver(name, workdir)
+        dates = generate_dates(args.years)
+
+        start = time.perf_counter()
+        populate(driver, dates, args.entries_per_day)
+        results["populate"] = {"entries": len(dates) * args.entries_per_day,
+                               "seconds": time.perf_counter() - start}
+
+        facade = Daily(driver)
+        results["add_entry"] = measure(lambda i: driver.add_entry(rnd.choice(dates), f"bench {i}"), args.iterations)
+        results["get_entry"] = measure(lambda i: driver.get_entry(rnd.choice(dates)), args.iterations)
+        results["get_latest_entry"] = measure(lambda i: facade.get_latest_entry(), args.iterations)
+        results["get_ids"] = measure(lambda i: driver.get_ids(rnd.choice(dates)), args.iterations)
+
+        driver.close()
+        os.environ.update({
+            "DAILY_CONFIG": os.devnull,
+            "DAILY_DRIVER": name,
+            "DAILY_SQLITE_PATH": os.path.join(workdir, "daily.db"),
+            "DAILY_FS_PATH": os.path.join(workdir, "daily"),
+        })
+        results["main_get"] = measure(lambda i: run_main(["-d", rnd.choice(dates), "get"]), args.iterations)
+        results["main_add"] = measure(lambda i: run_main(["add", "-m", f"bench {i}"]), args.iterations)
+        driver = build_driver(name, workdir)
+
+        nuke_dates = rnd.sample(dates, min(args.iterations, len(dates)))
+        results["nuke_entries"] = measure(lambda i: driver.nuke_entries(nuke_dates[i]), len(nuke_dates))
+        driver.close()
+
+    results["peak_rss_kb"] = peak_rss_kb()
+    return results
+
+
+def bench_driver_isolated(name: str, args: argparse.Namespace) -> dict:
+    # ru_maxrss is a high-water mark of the whole process, a fresh process per driver keeps one
+    # driver's peak from showing up in the next one's report
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(bench_driver, name, args).result()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="benchmark the daily drivers on a synthetic journal")
+    parser.add_argument("--years", type=int, default=10, help="years of synthetic entries")
+    parser.add_argument("--entries-per-day", type=int, default=20, help="synthetic entries per day")
+    parser.add_argument("-n", "--iterations", type=int, default=200, help="iterations per benchmark")
+    parser.add_argument("--driver", choices=DRIVERS, action="append", dest="drivers",
+                        help="driver to benchmark, may be given multiple times (default: all)")
+    parser.add_argument("--seed", type=int, default=42, help="seed for picking random dates")
+    parser.add_argument("-o", "--output", help="write the json report to this file instead of stdout")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = {
+        "years": args.years,
+        "entries_per_day": args.entries_per_day,
+        "iterations": args.iterations,
+        "drivers": {name: bench_driver_isolated(name, args) for name in args.drivers or DRIVERS},
+    }
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,112 @@
 #!/usr/bin/env python3
 
+import time
+
+_IMPORT_START = time.perf_counter()
+
+# the imports below are timed for --profile-startup
+# pylint: disable=wrong-import-position
 import argparse
+import configparser
+import functools
+import io
+import json
 import os.path
 import re
-import subprocess
 import sys
-import sqlite3
+import threading
 
-from dataclasses import dataclass, field
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
 from datetime import date, timedelta
 from pathlib import Path
-from typing import Optional, List, Tuple
-
-from pyfzf.pyfzf import FzfPrompt
+from types import SimpleNamespace
+from itertools import groupby, islice
+from typing import Callable, Optional, Iterable, Iterator, List, Tuple
+# pylint: enable=wrong-import-position
 
 DEFAULT_EDITOR = 'vim'
 ENTRIES_DIR = "~/Work/daily"
 SQLITE_DB_FILE = "~/Work/daily.db"
+DAEMON_SOCKET = "~/Work/daily.sock"
+DAEMON_TIMEOUT = 2
+DAEMON_GREETING = b"ready\n"
+HTTP_HOST = "127.0.0.1"
+HTTP_PORT = 8790
+HTTP_KEEPALIVE_TIMEOUT = 30
+HTTP_MAX_BODY_SIZE = 1024 * 1024
+LOOPBACK_HOSTS = {"localhost", "127.0.0.1", "::1"}
+WILDCARD_HOSTS = {"", "0.0.0.0", "::"}
+CONFIG_FILE = os.path.join(os.environ.get("XDG_CONFIG_HOME", "~/.config"), "daily", "config.ini")
+DEFAULT_DRIVER = "sqlite"
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_GROUP_COMMIT_DELAY_MS = 2
+DEFAULT_GROUP_COMMIT_MAX_ROWS = 500
+DEFAULT_ASYNC_WORKERS = 8
+DEFAULT_ASYNC_CHUNK_SIZE = 256
+MIN_DATE = "0000-01-01"
+MAX_DATE = "9999-12-31"
 DEFAULT_EXTENSION = "txt"
+FS_INDEX_FILE = ".index"
+FS_LOCK_FILE = ".index.lock"
+FS_INDEX_VERSION = "v2"
+FS_LAYOUTS = ["flat", "sharded"]
+DEFAULT_FS_LAYOUT = "flat"
 DATE_FORMAT = "%Y-%m-%d"
+DEFAULT_SQLITE_PROFILE = "safe"
+DEFAULT_SQLITE_ARRAYSIZE = 256
+DEFAULT_SQLITE_BUSY_TIMEOUT_MS = 5000
+DEFAULT_SQLITE_POOL_SIZE = 4
+DEFAULT_SQLITE_RETRIES = 5
+DEFAULT_SQLITE_RETRY_BASE_MS = 10
+DEFAULT_SQLITE_RETRY_MAX_MS = 1000
+OUTPUT_BUFFER_SIZE = 64 * 1024
+OUTPUT_FORMATS = ["text", "ndjson", "csv", "tsv"]
+ROW_FIELDS = ["date", "id", "tag", "desc"]
+
+SQLITE_PRAGMA_PROFILES = {
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "temp_store": "MEMORY",
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+}
+
+# each migration is applied in its own transaction and bumps PRAGMA user_version to its
+# position in the list. the statements are idempotent, databases that were created before
+# the schema was versioned start out at version 0 and replay them safely.
+SQLITE_MIGRATIONS = [
+    [
+        'CREATE TABLE IF NOT EXISTS daily (id INTEGER PRIMARY KEY, date INTEGER, desc TEXT, tag TEXT)',
+        'CREATE INDEX IF NOT EXISTS date ON daily(date)',
+    ],
+    [
+        'CREATE INDEX IF NOT EXISTS tag_date ON daily(tag, date)',
+    ],
+    [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS daily_fts USING fts5(desc, content='daily', content_rowid='id')",
+        'CREATE TRIGGER IF NOT EXISTS daily_fts_insert AFTER INSERT ON daily BEGIN '
+        'INSERT INTO daily_fts(rowid, desc) VALUES (new.id, new.desc); END',
+        'CREATE TRIGGER IF NOT EXISTS daily_fts_delete AFTER DELETE ON daily BEGIN '
+        "INSERT INTO daily_fts(daily_fts, rowid, desc) VALUES ('delete', old.id, old.desc); END",
+        'CREATE TRIGGER IF NOT EXISTS daily_fts_update AFTER UPDATE ON daily BEGIN '
+        "INSERT INTO daily_fts(daily_fts, rowid, desc) VALUES ('delete', old.id, old.desc); "
+        'INSERT INTO daily_fts(rowid, desc) VALUES (new.id, new.desc); END',
+        "INSERT INTO daily_fts(daily_fts) VALUES ('rebuild')",
+    ],
+]
+
+# non-interactive commands that are forwarded to a running daemon
+DAEMON_COMMANDS = {None, "add", "get", "search", "metrics"}
 
 daily_entry_regex = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
@@ -27,17 +115,69 @@ class IllegalDateException(Exception):
     pass
 
 
+class InvalidQueryException(Exception):
+    pass
+
+
+class UnsupportedOperationException(Exception):
+    pass
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
 @dataclass
 class Result:
-    items: list[str] = field(default_factory=list)
+    items: Iterable[str] = field(default_factory=list)
     warnings: list[str] = field(default_factory=list)
     daily_date: str = ""
 
 
+@dataclass
+class RetryMetrics:
+    retries: int = 0
+    failures: int = 0
+    wait_seconds: float = 0.0
+
+
+@dataclass
+class RetryPolicy:
+    # jittered exponential backoff for writes that still find the database locked once the busy
+    # timeout ran out. on_retry is called with (operation, attempt, delay in seconds) before sleeping.
+    retries: int = DEFAULT_SQLITE_RETRIES
+    base_delay_ms: float = DEFAULT_SQLITE_RETRY_BASE_MS
+    max_delay_ms: float = DEFAULT_SQLITE_RETRY_MAX_MS
+    on_retry: Optional[Callable[[str, int, float], None]] = None
+
+    def delay(self, attempt: int) -> float:
+        # full jitter, so that writers that collided once don't collide again on the next attempt
+        ceiling = min(self.max_delay_ms, self.base_delay_ms * 2 ** attempt)
+        import random
+
+        return random.uniform(0, ceiling) / 1000
+
+
+def transfer(source, target, batch_size: int = DEFAULT_BATCH_SIZE, progress=None) -> int:
+    rows = ((daily_date, desc, tag) for daily_date, _, tag, desc in source.iter_rows(MIN_DATE, MAX_DATE))
+    return target.add_bulk(rows, batch_size=batch_size, progress=progress)
+
+
 class Daily:
     def __init__(self, driver):
         self.driver = driver
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self.driver.close()
+
     @staticmethod
     def _validate_date(daily_date: str) -> None:
         if not daily_date:
@@ -64,41 +204,74 @@ class Daily:
         Daily._validate_date(special_date)
         return special_date
 
+    def data_version(self) -> Optional[int]:
+        return self.driver.data_version()
+
     def has_entry(self, daily_date) -> bool:
         return self.driver.has_entry(daily_date)
 
+    def check_tag(self, tag: Optional[str]) -> None:
+        self.driver.check_tag(tag)
+
+    def retry_metrics(self) -> RetryMetrics:
+        # only the sqlite driver retries writes
+        return getattr(self.driver, "retry_metrics", None) or RetryMetrics()
+
     def get_latest_entry(self) -> Optional[str]:
-        # this was written for the fs driver, doesn't scale well for sqlite
-        for i in range(30):
-            daily_date = Daily.compute_date(-i)
-            if self.has_entry(daily_date):
-                return daily_date
-        return None
+        return self.driver.latest_date(before=Daily.compute_date(days_offset=0))
 
-    def get_entry(self, daily_date: str) -> Optional[Result]:
+    def get_entry(self, daily_date: str, tag: Optional[str] = None) -> Optional[Result]:
         result = Result()
         if not self.has_entry(daily_date):
             new_daily_date = self.get_latest_entry()
             if not new_daily_date:
-                result.warnings.append("No entries found for the last 30 days")
+                result.warnings.append("No entries found")
                 return result
 
             result.warnings.append(f"Nothing found for {daily_date}, "
                                    f"showing results for {new_daily_date}")
             daily_date = new_daily_date
 
-        result.items = self.driver.get_entry(daily_date)
+        result.items = self.driver.iter_entry(daily_date, tag=tag)
         result.daily_date = daily_date
         return result
 
+    def get_range(self, start: str, end: str, tag: Optional[str] = None) -> Iterator[Result]:
+        # validated here rather than in a generator, which would only raise once it is consumed
+        if start > end:
+            raise IllegalDateException(f"Start date {start} is after end date {end}")
+
+        return (Result(items=items, daily_date=daily_date)
+                for daily_date, items in self.driver.get_range(start, end, tag=tag))
+
+    def iter_rows(self, start: str, end: str, tag: Optional[str] = None) -> Iterator[Tuple[str, int, str, str]]:
+        if start > end:
+            raise IllegalDateException(f"Start date {start} is after end date {end}")
+        return self.driver.iter_rows(start, end, tag=tag)
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, str]]:
+        return self.driver.search(query, limit)
+
+    def migrate_layout(self, layout: str) -> int:
+        return self.driver.migrate_layout(layout)
+
+    def export_entries(self, target, batch_size: int = DEFAULT_BATCH_SIZE, progress=None) -> int:
+        return transfer(self.driver, target, batch_size=batch_size, progress=progress)
+
+    def import_entries(self, source, batch_size: int = DEFAULT_BATCH_SIZE, progress=None) -> int:
+        return transfer(source, self.driver, batch_size=batch_size, progress=progress)
+
     def nuke_entries(self, daily_date: str) -> bool:
         return self.driver.nuke_entries(daily_date)
 
     def edit_entry(self, daily_date: str, entry_id: int, updated: str) -> int:
         return self.driver.edit_entry(daily_date, entry_id, updated)
 
-    def add_entry(self, daily_date: str, content: str) -> None:
-        return self.driver.add_entry(daily_date, content)
+    def add_entry(self, daily_date: str, content: str, tag: str = "") -> None:
+        return self.driver.add_entry(daily_date, content, tag=tag)
+
+    def add_entries(self, daily_date: str, contents: List[str], tag: str = "") -> None:
+        return self.driver.add_entries(daily_date, contents, tag=tag)
 
     def remove_entry(self, daily_date: str, entry_id: int) -> int:
         return self.driver.remove_entry(daily_date, entry_id)
@@ -107,126 +280,1242 @@ class Daily:
         return self.driver.get_ids(daily_date)
 
 
+class AsyncDaily:
+    # runs the blocking Daily calls on worker threads so that an event loop keeps serving other requests
+    # meanwhile. drivers that are not thread-safe get a single dedicated worker, thread-safe drivers get
+    # a pool of workers. results are read completely on the worker, ranges and rows are streamed in chunks.
+    #
+    # daily is either a Daily or a callable returning one. a callable is invoked on the worker thread,
+    # which is what a sqlite connection bound to the thread that opened it needs.
+    def __init__(self, daily, executor=None, workers: int = DEFAULT_ASYNC_WORKERS,
+                 chunk_size: int = DEFAULT_ASYNC_CHUNK_SIZE):
+        # imported here, the synchronous cli never needs it
+        from concurrent.futures import ThreadPoolExecutor
+
+        self._chunk_size = chunk_size
+        self._own_executor = executor is None
+        if callable(daily):
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="daily")
+            daily = executor.submit(daily).result()
+            if self._own_executor and daily.driver.thread_safe and workers > 1:
+                # any thread may use the driver, trade the single worker for a pool
+                executor.shutdown()
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="daily")
+        elif getattr(daily.driver, "thread_bound", False):
+            raise ValueError("The driver can only be used from the thread that opened it, pass a callable "
+                             "that creates the Daily instead or open it with check_same_thread=False")
+        elif executor is None:
+            if not daily.driver.thread_safe:
+                workers = 1
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="daily")
+        self.daily = daily
+        self._executor = executor
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self) -> None:
+        await self._run(self.daily.close)
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+    async def _run(self, func, *args, **kwargs):
+        import asyncio
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor,
+                                                                functools.partial(func, *args, **kwargs))
+
+    def _next_chunk(self, iterator: Iterator) -> list:
+        return list(islice(iterator, self._chunk_size))
+
+    async def _stream(self, func, *args, **kwargs):
+        iterator = await self._run(lambda: iter(func(*args, **kwargs)))
+        try:
+            chunk = await self._run(self._next_chunk, iterator)
+            while chunk:
+                for item in chunk:
+                    yield item
+                chunk = await self._run(self._next_chunk, iterator)
+        finally:
+            # hands a pooled connection back right away if the caller stopped early
+            if hasattr(iterator, "close"):
+                await self._run(iterator.close)
+
+    def _get_entry(self, daily_date: str, tag: Optional[str] = None) -> Optional[Result]:
+        result = self.daily.get_entry(daily_date, tag=tag)
+        result.items = list(result.items)
+        return result
+
+    async def translate_date(self, special_date: str) -> str:
+        return await self._run(self.daily.translate_date, special_date)
+
+    async def data_version(self) -> Optional[int]:
+        return await self._run(self.daily.data_version)
+
+    def retry_metrics(self) -> RetryMetrics:
+        return self.daily.retry_metrics()
+
+    async def has_entry(self, daily_date: str) -> bool:
+        return await self._run(self.daily.has_entry, daily_date)
+
+    async def get_latest_entry(self) -> Optional[str]:
+        return await self._run(self.daily.get_latest_entry)
+
+    async def get_entry(self, daily_date: str, tag: Optional[str] = None) -> Optional[Result]:
+        return await self._run(self._get_entry, daily_date, tag=tag)
+
+    def get_range(self, start: str, end: str, tag: Optional[str] = None):
+        return self._stream(self.daily.get_range, start, end, tag=tag)
+
+    def iter_rows(self, start: str, end: str, tag: Optional[str] = None):
+        return self._stream(self.daily.iter_rows, start, end, tag=tag)
+
+    async def search(self, query: str, limit: int = 20) -> List[Tuple[str, str]]:
+        return await self._run(self.daily.search, query, limit)
+
+    async def get_ids(self, daily_date: str) -> List[Tuple[int, str]]:
+        return await self._run(self.daily.get_ids, daily_date)
+
+    async def nuke_entries(self, daily_date: str) -> bool:
+        return await self._run(self.daily.nuke_entries, daily_date)
+
+    async def edit_entry(self, daily_date: str, entry_id: int, updated: str) -> int:
+        return await self._run(self.daily.edit_entry, daily_date, entry_id, updated)
+
+    async def add_entry(self, daily_date: str, content: str, tag: str = "") -> None:
+        return await self._run(self.daily.add_entry, daily_date, content, tag=tag)
+
+    async def add_entries(self, daily_date: str, contents: List[str], tag: str = "") -> None:
+        return await self._run(self.daily.add_entries, daily_date, contents, tag=tag)
+
+    async def remove_entry(self, daily_date: str, entry_id: int) -> int:
+        return await self._run(self.daily.remove_entry, daily_date, entry_id)
+
+
 class SqliteDriver:
-    def __init__(self, filename: str):
-        self._con = sqlite3.connect(os.path.expanduser(filename))
+    thread_safe = False
+
+    def __init__(self, filename: str, profile: str = DEFAULT_SQLITE_PROFILE,
+                 arraysize: int = DEFAULT_SQLITE_ARRAYSIZE, pragmas: Optional[dict] = None,
+                 check_same_thread: bool = True, busy_timeout_ms: int = DEFAULT_SQLITE_BUSY_TIMEOUT_MS,
+                 retry: Optional[RetryPolicy] = None):
+        self._arraysize = arraysize
+        if profile not in SQLITE_PRAGMA_PROFILES:
+            raise ValueError(f"Unknown sqlite profile '{profile}', "
+                             f"choose one of {', '.join(SQLITE_PRAGMA_PROFILES)}")
+        self._filename = os.path.expanduser(filename)
+        self._pragmas = {**SQLITE_PRAGMA_PROFILES[profile], **(pragmas or {})}
+        self._check_same_thread = check_same_thread
+        self._busy_timeout = busy_timeout_ms / 1000
+        self._retry = retry or RetryPolicy()
+        self.retry_metrics = RetryMetrics()
+        self._metrics_lock = threading.Lock()
+        self._con = self._connect()
         self._init_db()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self._con.close()
+
+    @property
+    def thread_bound(self) -> bool:
+        return self._check_same_thread
+
+    @staticmethod
+    def check_tag(tag: Optional[str]) -> None:
+        # every tag can be stored
+        pass
+
+    def _connect(self):
+        # imported here so that only the configured driver pays for loading its backend
+        import sqlite3
+
+        con = sqlite3.connect(self._filename, check_same_thread=self._check_same_thread,
+                              timeout=self._busy_timeout)
+        self._apply_pragmas(con, self._pragmas)
+        return con
+
+    @contextmanager
+    def _reader(self):
+        yield self._con
+
+    @contextmanager
+    def _writer(self):
+        yield self._con
+
+    @staticmethod
+    def _is_locked(err: Exception) -> bool:
+        # SQLITE_BUSY and SQLITE_LOCKED, older pythons only expose them through the message
+        code = getattr(err, "sqlite_errorcode", None)
+        if code is not None:
+            return code & 0xff in (5, 6)
+        return "locked" in str(err) or "busy" in str(err)
+
+    def _execute_write(self, operation: str, sql: str, args, many: bool = False) -> int:
+        # runs and commits a single write statement, retrying with backoff while the database is locked.
+        # a failed attempt is rolled back first so that a retry never commits the rows twice.
+        import sqlite3
+
+        attempt = 0
+        while True:
+            try:
+                with self._writer() as con:
+                    try:
+                        cursor = con.executemany(sql, args) if many else con.execute(sql, args)
+                        con.commit()
+                    except sqlite3.Error:
+                        con.rollback()
+                        raise
+                return cursor.rowcount
+            except sqlite3.OperationalError as err:
+                if not self._is_locked(err):
+                    raise
+                if attempt >= self._retry.retries:
+                    with self._metrics_lock:
+                        self.retry_metrics.failures += 1
+                    raise
+            delay = self._retry.delay(attempt)
+            attempt += 1
+            with self._metrics_lock:
+                self.retry_metrics.retries += 1
+                self.retry_metrics.wait_seconds += delay
+            if self._retry.on_retry:
+                self._retry.on_retry(operation, attempt, delay)
+            time.sleep(delay)
+
+    def data_version(self) -> Optional[int]:
+        # changes whenever another connection commits to the database, our own commits don't touch it.
+        # values are only comparable within one connection, so this always asks the writer.
+        with self._writer() as con:
+            return con.execute('PRAGMA data_version').fetchone()[0]
+
+    @staticmethod
+    def _apply_pragmas(con, pragmas: dict) -> None:
+        cursor = con.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
     def _init_db(self):
+        import sqlite3
+
         cursor = self._con.cursor()
-        cursor.execute('CREATE TABLE IF NOT EXISTS daily (id INTEGER PRIMARY KEY, date INTEGER, desc TEXT, tag TEXT)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS date ON daily(date)')
-        self._con.commit()
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        for target, statements in enumerate(SQLITE_MIGRATIONS[version:], start=version + 1):
+            try:
+                cursor.execute('BEGIN')
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(f'PRAGMA user_version = {target}')
+                self._con.commit()
+            except sqlite3.Error:
+                self._con.rollback()
+                raise
 
     @staticmethod
     def _convert_date(daily_date: str) -> int:
         return int(daily_date.replace("-", ""))
 
+    @staticmethod
+    def _revert_date(converted: int) -> str:
+        digits = str(converted)
+        return f"{digits[:4]}-{digits[4:6]}-{digits[6:]}"
+
     def has_entry(self, daily_date: str) -> bool:
         converted = SqliteDriver._convert_date(daily_date)
-        cursor = self._con.cursor()
-        cursor.execute('SELECT COUNT(date) FROM daily WHERE date = ?', (converted,))
-        results = cursor.fetchone()
+        with self._reader() as con:
+            cursor = con.cursor()
+            cursor.execute('SELECT COUNT(date) FROM daily WHERE date = ?', (converted,))
+            results = cursor.fetchone()
         return results[0] > 0
 
+    def latest_date(self, before: Optional[str] = None) -> Optional[str]:
+        with self._reader() as con:
+            cursor = con.cursor()
+            if before:
+                cursor.execute('SELECT MAX(date) FROM daily WHERE date <= ?', (SqliteDriver._convert_date(before),))
+            else:
+                cursor.execute('SELECT MAX(date) FROM daily')
+            result = cursor.fetchone()[0]
+        if result is None:
+            return None
+        return SqliteDriver._revert_date(result)
+
+    def _iter_rows(self, cursor) -> Iterator[tuple]:
+        cursor.arraysize = self._arraysize
+        rows = cursor.fetchmany()
+        while rows:
+            yield from rows
+            rows = cursor.fetchmany()
+
     def get_entry(self, daily_date: str) -> List[str]:
-        cursor = self._con.cursor()
+        return list(self.iter_entry(daily_date))
+
+    def iter_entry(self, daily_date: str, tag: Optional[str] = None) -> Iterator[str]:
         converted = SqliteDriver._convert_date(daily_date)
-        cursor.execute('SELECT desc FROM daily WHERE date = ? ORDER BY id ASC', (converted,))
-        results = cursor.fetchall()
-        ret = []
-        for result in results:
-            ret.append(result[0])
-        return ret
+        with self._reader() as con:
+            cursor = con.cursor()
+            if tag is None:
+                cursor.execute('SELECT desc FROM daily WHERE date = ? ORDER BY id ASC', (converted,))
+            else:
+                cursor.execute('SELECT desc FROM daily WHERE tag = ? AND date = ? ORDER BY id ASC', (tag, converted))
+            for row in self._iter_rows(cursor):
+                yield row[0]
+
+    def get_range(self, start: str, end: str, tag: Optional[str] = None) -> Iterator[Tuple[str, List[str]]]:
+        args = (SqliteDriver._convert_date(start), SqliteDriver._convert_date(end))
+        with self._reader() as con:
+            cursor = con.cursor()
+            if tag is None:
+                cursor.execute('SELECT date, desc FROM daily WHERE date BETWEEN ? AND ? '
+                               'ORDER BY date ASC, id ASC', args)
+            else:
+                cursor.execute('SELECT date, desc FROM daily WHERE tag = ? AND date BETWEEN ? AND ? '
+                               'ORDER BY date ASC, id ASC', (tag, *args))
+            for converted, rows in groupby(self._iter_rows(cursor), key=lambda row: row[0]):
+                yield SqliteDriver._revert_date(converted), [row[1] for row in rows]
+
+    def iter_rows(self, start: str, end: str, tag: Optional[str] = None) -> Iterator[Tuple[str, int, str, str]]:
+        args = (SqliteDriver._convert_date(start), SqliteDriver._convert_date(end))
+        with self._reader() as con:
+            cursor = con.cursor()
+            if tag is None:
+                cursor.execute('SELECT date, id, tag, desc FROM daily WHERE date BETWEEN ? AND ? '
+                               'ORDER BY date ASC, id ASC', args)
+            else:
+                cursor.execute('SELECT date, id, tag, desc FROM daily WHERE tag = ? AND date BETWEEN ? AND ? '
+                               'ORDER BY date ASC, id ASC', (tag, *args))
+            for converted, entry_id, entry_tag, desc in self._iter_rows(cursor):
+                yield SqliteDriver._revert_date(converted), entry_id, entry_tag or "", desc
+
+    def add_bulk(self, rows: Iterable[Tuple[str, str, str]], batch_size: int = DEFAULT_BATCH_SIZE,
+                 progress=None) -> int:
+        # rows are (date, content, tag), every batch is inserted and committed as one transaction
+        rows = iter(rows)
+        count = 0
+        batch = [(None, SqliteDriver._convert_date(daily_date), content, tag)
+                 for daily_date, content, tag in islice(rows, batch_size)]
+        while batch:
+            self._execute_write("add_bulk", 'INSERT INTO daily VALUES (?, ?, ?, ?)', batch, many=True)
+            count += len(batch)
+            if progress:
+                progress(count)
+            batch = [(None, SqliteDriver._convert_date(daily_date), content, tag)
+                     for daily_date, content, tag in islice(rows, batch_size)]
+        return count
+
+    def migrate_layout(self, layout: str) -> int:
+        raise UnsupportedOperationException("only the fs driver stores entries in a file layout")
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, str]]:
+        import sqlite3
+
+        with self._reader() as con:
+            cursor = con.cursor()
+            try:
+                cursor.execute("SELECT daily.date, snippet(daily_fts, 0, '[', ']', '...', 12) FROM daily_fts "
+                               'JOIN daily ON daily.id = daily_fts.rowid WHERE daily_fts MATCH ? '
+                               'ORDER BY rank LIMIT ?', (query, limit))
+            except sqlite3.OperationalError as err:
+                raise InvalidQueryException(str(err)) from err
+            results = cursor.fetchall()
+        return [(SqliteDriver._revert_date(converted), snippet) for converted, snippet in results]
 
     def add_entry(self, daily_date: str, content: str, tag="") -> None:
         converted = SqliteDriver._convert_date(daily_date)
-        cursor = self._con.cursor()
         args = (None, converted, content, tag)
-        cursor.execute('INSERT INTO daily VALUES (?, ?, ?, ?)', args)
-        self._con.commit()
-        self._con.close()
+        self._execute_write("add_entry", 'INSERT INTO daily VALUES (?, ?, ?, ?)', args)
+
+    def add_entries(self, daily_date: str, contents: List[str], tag="") -> None:
+        converted = SqliteDriver._convert_date(daily_date)
+        args = [(None, converted, content, tag) for content in contents]
+        self._execute_write("add_entries", 'INSERT INTO daily VALUES (?, ?, ?, ?)', args, many=True)
 
     def nuke_entries(self, daily_date: str) -> int:
         converted = SqliteDriver._convert_date(daily_date)
-        cursor = self._con.cursor()
-        result = cursor.execute('DELETE FROM daily WHERE date = ?', (converted,))
-        self._con.commit()
-        self._con.close()
-        return result.rowcount
+        return self._execute_write("nuke_entries", 'DELETE FROM daily WHERE date = ?', (converted,))
 
     def remove_entry(self, daily_date: str, entry_id: int) -> int:
-        cursor = self._con.cursor()
-        result = cursor.execute('DELETE FROM daily WHERE id = ?', (entry_id,))
-        self._con.commit()
-        self._con.close()
-        return result.rowcount
+        return self._execute_write("remove_entry", 'DELETE FROM daily WHERE id = ?', (entry_id,))
 
     def edit_entry(self, daily_date: str, entry_id: int, updated: str) -> int:
-        cursor = self._con.cursor()
-        result = cursor.execute('UPDATE daily SET desc = ? WHERE id = ?', (updated, entry_id))
-        self._con.commit()
-        self._con.close()
-        return result.rowcount
+        return self._execute_write("edit_entry", 'UPDATE daily SET desc = ? WHERE id = ?', (updated, entry_id))
 
     def get_ids(self, daily_date: str) -> List[Tuple[int, str]]:
-        cursor = self._con.cursor()
+        return list(self.iter_ids(daily_date))
+
+    def iter_ids(self, daily_date: str) -> Iterator[Tuple[int, str]]:
         converted = SqliteDriver._convert_date(daily_date)
-        cursor.execute('SELECT id, desc FROM daily WHERE date = ? ORDER BY id ASC', (converted,))
-        return cursor.fetchall()
+        with self._reader() as con:
+            cursor = con.cursor()
+            cursor.execute('SELECT id, desc FROM daily WHERE date = ? ORDER BY id ASC', (converted,))
+            yield from self._iter_rows(cursor)
+
+
+class PooledSqliteDriver(SqliteDriver):
+    # can be shared by a thread pool: all writes go through a single writer connection guarded by a
+    # lock, reads check out one of up to pool_size reader connections. with the WAL journal readers
+    # neither block each other nor the writer.
+    thread_safe = True
+
+    def __init__(self, filename: str, pool_size: int = DEFAULT_SQLITE_POOL_SIZE, **kwargs):
+        if pool_size < 1:
+            raise ValueError("The pool needs at least one reader connection")
+        import queue
+
+        kwargs["check_same_thread"] = False
+        self._pool_size = pool_size
+        self._readers = queue.LifoQueue()
+        self._connections = []
+        self._pool_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        super().__init__(filename, **kwargs)
+
+    def close(self) -> None:
+        with self._pool_lock:
+            for con in self._connections:
+                con.close()
+            self._connections.clear()
+        with self._write_lock:
+            super().close()
+
+    @contextmanager
+    def _reader(self):
+        con = self._checkout()
+        try:
+            yield con
+        finally:
+            self._readers.put(con)
+
+    @contextmanager
+    def _writer(self):
+        with self._write_lock:
+            yield self._con
+
+    def _checkout(self):
+        import queue
+
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._pool_lock:
+            if len(self._connections) < self._pool_size:
+                con = self._connect()
+                self._connections.append(con)
+                return con
+        # the pool is exhausted, wait for another thread to return its connection
+        return self._readers.get()
 
 
 class FsDriver:
-    def __init__(self, daily_entries_dir=ENTRIES_DIR):
+    thread_safe = False
+
+    def __init__(self, daily_entries_dir=ENTRIES_DIR, layout: str = DEFAULT_FS_LAYOUT):
+        if layout not in FS_LAYOUTS:
+            raise ValueError(f"Unknown fs layout '{layout}', choose one of {', '.join(FS_LAYOUTS)}")
         self._daily_entries_dir = os.path.expanduser(daily_entries_dir)
+        self._layout = layout
+        self._index = None
+        self._index_mtime = None
+        self._shard_mtimes = {}
+        self._lock_file = None
         self._sanitize()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        pass
+
+    def data_version(self) -> Optional[int]:
+        # every write rewrites the index file, which bumps the directory mtime
+        return os.stat(self._daily_entries_dir).st_mtime_ns
+
     def _sanitize(self):
         daily_db_dir = Path(self._daily_entries_dir)
         if not daily_db_dir.is_dir():
             print(f"Creating dir {self._daily_entries_dir}")
             daily_db_dir.mkdir(parents=True)
 
-    def _get_filename(self, daily_date: str) -> str:
-        return os.path.join(self._daily_entries_dir, f"{daily_date}.{DEFAULT_EXTENSION.lstrip('.')}")
+    @staticmethod
+    def check_tag(tag: Optional[str]) -> None:
+        if tag:
+            raise UnsupportedOperationException("tags are not supported by the fs driver")
+
+    def _get_filename(self, daily_date: str, layout: Optional[str] = None) -> str:
+        # the flat layout keeps all days in one directory (YYYY-MM-DD.txt), the sharded layout
+        # splits them into a directory per year and month (YYYY/MM/DD.txt)
+        extension = DEFAULT_EXTENSION.lstrip('.')
+        if (layout or self._layout) == "sharded":
+            year, month, day = daily_date.split("-")
+            return os.path.join(self._daily_entries_dir, year, month, f"{day}.{extension}")
+        return os.path.join(self._daily_entries_dir, f"{daily_date}.{extension}")
+
+    def _locate(self, daily_date: str) -> Optional[str]:
+        # files are read from either layout, so a partially migrated directory keeps working
+        for layout in sorted(FS_LAYOUTS, key=lambda layout: layout != self._layout):
+            filename = self._get_filename(daily_date, layout)
+            if os.path.exists(filename):
+                return filename
+        return None
+
+    def _get_writable_filename(self, daily_date: str) -> str:
+        # days that already exist are appended to wherever they live, new days follow the configured layout
+        filename = self._locate(daily_date)
+        if filename:
+            return filename
+        filename = self._get_filename(daily_date)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        return filename
+
+    def _scan_files(self) -> Iterator[Tuple[str, str, int]]:
+        with os.scandir(self._daily_entries_dir) as entries:
+            for entry in entries:
+                daily_date = self._date_from_filename(entry.name)
+                if daily_date and entry.is_file():
+                    yield daily_date, entry.path, entry.stat().st_mtime_ns
+                elif re.fullmatch(r"\d{4}", entry.name) and entry.is_dir():
+                    yield from self._scan_shard(entry.name, entry.path)
+
+    def _scan_shard(self, year: str, path: str) -> Iterator[Tuple[str, str, int]]:
+        suffix = f".{DEFAULT_EXTENSION.lstrip('.')}"
+        with os.scandir(path) as months:
+            for month in months:
+                if not re.fullmatch(r"\d{2}", month.name) or not month.is_dir():
+                    continue
+                with os.scandir(month.path) as days:
+                    for day in days:
+                        daily_date = f"{year}-{month.name}-{day.name[:-len(suffix)]}"
+                        if day.name.endswith(suffix) and daily_entry_regex.match(daily_date):
+                            yield daily_date, day.path, day.stat().st_mtime_ns
+
+    def _get_index_filename(self) -> str:
+        return os.path.join(self._daily_entries_dir, FS_INDEX_FILE)
+
+    def _date_from_filename(self, filename: str) -> Optional[str]:
+        suffix = f".{DEFAULT_EXTENSION.lstrip('.')}"
+        if not filename.endswith(suffix):
+            return None
+        daily_date = filename[:-len(suffix)]
+        if daily_entry_regex.match(daily_date):
+            return daily_date
+        return None
+
+    @staticmethod
+    def _count_lines(filename: str) -> int:
+        with open(filename, 'rb') as content:
+            return sum(1 for _ in content)
+
+    @contextmanager
+    def _index_lock(self):
+        # serializes index updates of all processes: a writer validates the index, changes a file and
+        # writes the index back, another writer's change must not slip in between. reentrant.
+        if self._lock_file is not None:
+            yield
+            return
+
+        import fcntl
+
+        with open(os.path.join(self._daily_entries_dir, FS_LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._lock_file = lock_file
+            try:
+                yield
+            finally:
+                self._lock_file = None
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _get_index(self) -> dict:
+        # the index maps each date to (line count, file mtime). it is valid as long as its own mtime
+        # equals the directory's mtime, which is stamped onto it after every write, and the year and
+        # month directories of the sharded layout still have the mtimes recorded in it. files that
+        # were created, renamed or deleted behind our back change one of these mtimes and trigger a
+        # rebuild that only re-counts files whose mtime differs from the stale index.
+        index = self._load_index()
+        if index is not None:
+            return index
+
+        with self._index_lock():
+            # another process may have rebuilt it while we waited for the lock
+            index = self._load_index()
+            if index is not None:
+                return index
+            self._index, self._shard_mtimes = self._rebuild_index(self._read_index()[0] or {})
+            self._write_index()
+            return self._index
+
+    def _load_index(self) -> Optional[dict]:
+        dir_mtime = os.stat(self._daily_entries_dir).st_mtime_ns
+        if self._index is not None and self._index_mtime == dir_mtime and self._shards_unchanged(self._shard_mtimes):
+            return self._index
+
+        stored, shard_mtimes, stored_mtime = self._read_index()
+        if stored is not None and stored_mtime == dir_mtime and self._shards_unchanged(shard_mtimes):
+            self._index = stored
+            self._shard_mtimes = shard_mtimes
+            self._index_mtime = dir_mtime
+            return self._index
+        return None
+
+    def _shards_unchanged(self, shard_mtimes: dict) -> bool:
+        for shard, mtime in shard_mtimes.items():
+            try:
+                if os.stat(os.path.join(self._daily_entries_dir, shard)).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def _scan_shard_mtimes(self) -> dict:
+        shard_mtimes = {}
+        with os.scandir(self._daily_entries_dir) as years:
+            for year in years:
+                if not re.fullmatch(r"\d{4}", year.name) or not year.is_dir():
+                    continue
+                shard_mtimes[year.name] = year.stat().st_mtime_ns
+                with os.scandir(year.path) as months:
+                    for month in months:
+                        if re.fullmatch(r"\d{2}", month.name) and month.is_dir():
+                            shard_mtimes[f"{year.name}/{month.name}"] = month.stat().st_mtime_ns
+        return shard_mtimes
+
+    def _stamp_shards(self, daily_date: str) -> None:
+        # our own writes change the mtimes of the shard they touched
+        year, month, _ = daily_date.split("-")
+        for shard in [year, f"{year}/{month}"]:
+            try:
+                self._shard_mtimes[shard] = os.stat(os.path.join(self._daily_entries_dir, shard)).st_mtime_ns
+            except FileNotFoundError:
+                self._shard_mtimes.pop(shard, None)
+
+    def _read_index(self) -> Tuple[Optional[dict], dict, Optional[int]]:
+        # the first line holds the format version, followed by one line per shard directory
+        # (path, mtime) and one per date (date, line count, mtime)
+        index = {}
+        shard_mtimes = {}
+        try:
+            with open(self._get_index_filename(), 'r') as index_file:
+                mtime = os.fstat(index_file.fileno()).st_mtime_ns
+                if index_file.readline().strip() != FS_INDEX_VERSION:
+                    return None, {}, None
+                for line in index_file:
+                    fields = line.split()
+                    if len(fields) == 2:
+                        shard_mtimes[fields[0]] = int(fields[1])
+                    else:
+                        daily_date, lines, file_mtime = fields
+                        index[daily_date] = (int(lines), int(file_mtime))
+        except (OSError, ValueError):
+            return None, {}, None
+        return index, shard_mtimes, mtime
+
+    def _rebuild_index(self, previous: dict) -> Tuple[dict, dict]:
+        # shard mtimes are taken first, a file that is added while scanning triggers another rebuild
+        shard_mtimes = self._scan_shard_mtimes()
+        index = {}
+        for daily_date, filename, mtime in self._scan_files():
+            known = previous.get(daily_date)
+            if known and known[1] == mtime:
+                index[daily_date] = known
+            else:
+                index[daily_date] = (FsDriver._count_lines(filename), mtime)
+        return index, shard_mtimes
+
+    def _write_index(self) -> None:
+        # the index is only a cache that can be rebuilt at any time, so it isn't fsynced
+        import tempfile
+
+        index_filename = self._get_index_filename()
+        fd, tmp_filename = tempfile.mkstemp(dir=self._daily_entries_dir, prefix=f"{FS_INDEX_FILE}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as index_file:
+                index_file.write(f"{FS_INDEX_VERSION}\n")
+                index_file.write("".join(f"{shard} {mtime}\n" for shard, mtime in sorted(self._shard_mtimes.items())))
+                index_file.write("".join(f"{daily_date} {lines} {mtime}\n"
+                                         for daily_date, (lines, mtime) in sorted(self._index.items())))
+            os.replace(tmp_filename, index_filename)
+        except BaseException:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            raise
+
+        dir_mtime = os.stat(self._daily_entries_dir).st_mtime_ns
+        os.utime(index_filename, ns=(dir_mtime, dir_mtime))
+        self._index_mtime = dir_mtime
+
+    def _update_index(self, daily_date: str, write: bool = True) -> None:
+        # writers validate the index under the index lock before touching the directory, their own
+        # change must not be mistaken for an external one
+        index = self._index if self._index is not None else self._get_index()
+        filename = self._locate(daily_date)
+        if filename:
+            index[daily_date] = (FsDriver._count_lines(filename), os.stat(filename).st_mtime_ns)
+        else:
+            index.pop(daily_date, None)
+        self._stamp_shards(daily_date)
+        if write:
+            self._write_index()
 
     def has_entry(self, daily_date) -> bool:
-        filename = self._get_filename(daily_date)
-        file_path = Path(filename)
-        return file_path.exists()
+        return daily_date in self._get_index()
+
+    def _list_dates(self) -> List[str]:
+        return sorted(self._get_index())
+
+    def latest_date(self, before: Optional[str] = None) -> Optional[str]:
+        dates = self._list_dates()
+        if before:
+            # dates are zero-padded, lexicographic order equals chronological order
+            dates = [daily_date for daily_date in dates if daily_date <= before]
+        if not dates:
+            return None
+        return dates[-1]
 
     def nuke_entries(self, daily_date: str) -> bool:
-        if self.has_entry(daily_date):
-            filename = self._get_filename(daily_date)
-            os.remove(filename)
-            return True
-        return False
+        with self._index_lock():
+            if not self.has_entry(daily_date):
+                return False
+            filename = self._locate(daily_date)
+            if filename:
+                os.remove(filename)
+            self._update_index(daily_date)
+        return True
 
     def get_entry(self, daily_date: str) -> List[str]:
+        return list(self.iter_entry(daily_date))
+
+    def iter_entry(self, daily_date: str, tag: Optional[str] = None) -> Iterator[str]:
+        FsDriver.check_tag(tag)
         if not self.has_entry(daily_date):
-            return []
+            return
 
-        filename = self._get_filename(daily_date)
+        filename = self._locate(daily_date)
+        if not filename:
+            return
         with open(filename, 'r') as content:
-            return content.readlines()
+            yield from content
+
+    def get_range(self, start: str, end: str, tag: Optional[str] = None) -> Iterator[Tuple[str, List[str]]]:
+        FsDriver.check_tag(tag)
+        for daily_date in self._list_dates():
+            filename = start <= daily_date <= end and self._locate(daily_date)
+            # a day that was deleted since the index was read is skipped
+            if filename:
+                with open(filename, 'r') as content:
+                    yield daily_date, content.readlines()
+
+    def iter_rows(self, start: str, end: str, tag: Optional[str] = None) -> Iterator[Tuple[str, int, str, str]]:
+        FsDriver.check_tag(tag)
+        for daily_date in self._list_dates():
+            filename = start <= daily_date <= end and self._locate(daily_date)
+            if filename:
+                with open(filename, 'r') as content:
+                    for line_number, line in enumerate(content, start=1):
+                        yield daily_date, line_number, "", line.rstrip("\n")
+
+    def add_bulk(self, rows: Iterable[Tuple[str, str, str]], batch_size: int = DEFAULT_BATCH_SIZE,
+                 progress=None) -> int:
+        # rows are (date, content, tag) and expected to be sorted by date so every day is written
+        # with a single append. files have no place for tags, they are dropped.
+        count = 0
+        with self._index_lock():
+            self._get_index()
+            for daily_date, day_rows in groupby(rows, key=lambda row: row[0]):
+                contents = [row[1] for row in day_rows]
+                with open(self._get_writable_filename(daily_date), "a") as entries_file:
+                    entries_file.write("".join(content + os.linesep for content in contents))
+                self._update_index(daily_date, write=False)
+                count += len(contents)
+                if progress:
+                    progress(count)
+            self._write_index()
+        return count
+
+    def add_entry(self, daily_date: str, content: str, tag: str = "") -> None:
+        self.add_entries(daily_date, [content], tag=tag)
+
+    def add_entries(self, daily_date: str, contents: List[str], tag: str = "") -> None:
+        FsDriver.check_tag(tag)
+        if not contents:
+            return
 
-    def add_entry(self, daily_date: str, content: str) -> None:
-        mode = "a"
-        if not self.has_entry(daily_date):
-            mode = "w"
+        # always appended, a day file the index doesn't know yet must not be truncated
+        with self._index_lock():
+            self._get_index()
+            filename = self._get_writable_filename(daily_date)
+            with open(filename, "a") as entries_file:
+                entries_file.write("".join(content + os.linesep for content in contents))
+            self._update_index(daily_date)
 
-        filename = self._get_filename(daily_date)
-        with open(filename, mode) as entries_file:
-            entries_file.write(content + os.linesep)
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, str]]:
+        raise UnsupportedOperationException("full-text search is not supported by the fs driver")
+
+    def _rewrite(self, daily_date: str, entry_id: int, updated: Optional[str]) -> int:
+        # entry ids are 1-based line numbers. the file is streamed into a temp file that replaces
+        # the line (or drops it if updated is None) and is then renamed over the original
+        if not self.has_entry(daily_date):
+            return 0
+
+        entry_id = int(entry_id)
+        filename = self._locate(daily_date)
+        if not filename:
+            return 0
+        import tempfile
+
+        directory = os.path.dirname(filename)
+        fd, tmp_filename = tempfile.mkstemp(dir=directory, prefix=f".{daily_date}.", suffix=".tmp")
+        changed = 0
+        written = 0
+        try:
+            with open(filename, 'r') as source, os.fdopen(fd, 'w') as target:
+                for line_number, line in enumerate(source, start=1):
+                    if line_number == entry_id:
+                        changed = 1
+                        if updated is None:
+                            continue
+                        line = updated + os.linesep
+                    target.write(line)
+                    written += 1
+                target.flush()
+                os.fsync(target.fileno())
+
+            if not changed:
+                os.remove(tmp_filename)
+                return 0
+
+            if written:
+                os.chmod(tmp_filename, os.stat(filename).st_mode)
+                os.replace(tmp_filename, filename)
+            else:
+                os.remove(tmp_filename)
+                os.remove(filename)
+        except BaseException:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            raise
+
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self._update_index(daily_date)
+        return changed
 
     def remove_entry(self, daily_date: str, entry_id: int) -> int:
-        raise NotImplementedError()
+        with self._index_lock():
+            return self._rewrite(daily_date, entry_id, None)
+
+    def migrate_layout(self, layout: str) -> int:
+        import shutil
+
+        if layout not in FS_LAYOUTS:
+            raise ValueError(f"Unknown fs layout '{layout}', choose one of {', '.join(FS_LAYOUTS)}")
+
+        moved = 0
+        with self._index_lock():
+            for daily_date, filename, _ in list(self._scan_files()):
+                target = self._get_filename(daily_date, layout)
+                if filename == target:
+                    continue
+
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if os.path.exists(target):
+                    # a day that exists in both layouts is merged instead of overwritten
+                    with open(filename, 'r') as source, open(target, 'a') as merged:
+                        shutil.copyfileobj(source, merged)
+                    os.remove(filename)
+                else:
+                    os.replace(filename, target)
+                moved += 1
+
+            if layout == "flat":
+                self._remove_empty_shards()
+            self._layout = layout
+            self._index, self._shard_mtimes = self._rebuild_index(self._index or {})
+            self._write_index()
+        return moved
+
+    def _remove_empty_shards(self) -> None:
+        for year in os.listdir(self._daily_entries_dir):
+            year_dir = os.path.join(self._daily_entries_dir, year)
+            if not re.fullmatch(r"\d{4}", year) or not os.path.isdir(year_dir):
+                continue
+            for month in os.listdir(year_dir):
+                month_dir = os.path.join(year_dir, month)
+                if os.path.isdir(month_dir) and not os.listdir(month_dir):
+                    os.rmdir(month_dir)
+            if not os.listdir(year_dir):
+                os.rmdir(year_dir)
 
     def get_ids(self, daily_date: str) -> List[Tuple[int, str]]:
-        raise NotImplementedError()
+        return list(self.iter_ids(daily_date))
+
+    def iter_ids(self, daily_date: str) -> Iterator[Tuple[int, str]]:
+        for line_number, line in enumerate(self.iter_entry(daily_date), start=1):
+            yield line_number, line.rstrip("\n")
 
     def edit_entry(self, daily_date: str, entry_id: int, updated: str) -> int:
-        raise NotImplementedError()
+        with self._index_lock():
+            return self._rewrite(daily_date, entry_id, updated)
+
+
+class CachingDriver:
+    def __init__(self, driver, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.driver = driver
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._latest = {}
+        self._version = None
+        self._lock = threading.RLock()
+
+    @property
+    def thread_safe(self) -> bool:
+        return self.driver.thread_safe
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self.clear()
+        self.driver.close()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._latest.clear()
+
+    def _validate(self) -> None:
+        # writes of other processes are detected via the driver's data version, our own writes
+        # invalidate the affected dates directly
+        version = self.driver.data_version()
+        with self._lock:
+            if version is None or version != self._version:
+                self.clear()
+                self._version = version
+
+    def _invalidate(self, daily_date: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == daily_date]:
+                del self._entries[key]
+            self._latest.clear()
+
+    def _cached_entries(self, daily_date: str, tag: Optional[str]) -> List[str]:
+        self._validate()
+        key = (daily_date, tag)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        entries = list(self.driver.iter_entry(daily_date, tag=tag))
+        with self._lock:
+            self._entries[key] = entries
+            if len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+        return entries
+
+    def has_entry(self, daily_date: str) -> bool:
+        return bool(self._cached_entries(daily_date, None))
+
+    def latest_date(self, before: Optional[str] = None) -> Optional[str]:
+        self._validate()
+        with self._lock:
+            if before in self._latest:
+                return self._latest[before]
+        latest = self.driver.latest_date(before=before)
+        with self._lock:
+            self._latest[before] = latest
+        return latest
+
+    def get_entry(self, daily_date: str) -> List[str]:
+        return list(self._cached_entries(daily_date, None))
+
+    def iter_entry(self, daily_date: str, tag: Optional[str] = None) -> Iterator[str]:
+        return iter(self._cached_entries(daily_date, tag))
+
+    def add_entry(self, daily_date: str, content: str, tag: str = "") -> None:
+        self.driver.add_entry(daily_date, content, tag=tag)
+        self._invalidate(daily_date)
+
+    def add_entries(self, daily_date: str, contents: List[str], tag: str = "") -> None:
+        self.driver.add_entries(daily_date, contents, tag=tag)
+        self._invalidate(daily_date)
+
+    def nuke_entries(self, daily_date: str) -> int:
+        result = self.driver.nuke_entries(daily_date)
+        self._invalidate(daily_date)
+        return result
+
+    def remove_entry(self, daily_date: str, entry_id: int) -> int:
+        result = self.driver.remove_entry(daily_date, entry_id)
+        self._invalidate(daily_date)
+        return result
+
+    def edit_entry(self, daily_date: str, entry_id: int, updated: str) -> int:
+        result = self.driver.edit_entry(daily_date, entry_id, updated)
+        self._invalidate(daily_date)
+        return result
+
+    def migrate_layout(self, layout: str) -> int:
+        result = self.driver.migrate_layout(layout)
+        self.clear()
+        return result
+
+    def add_bulk(self, rows: Iterable[Tuple[str, str, str]], batch_size: int = DEFAULT_BATCH_SIZE,
+                 progress=None) -> int:
+        dates = set()
+
+        def track(rows_to_track):
+            for row in rows_to_track:
+                dates.add(row[0])
+                yield row
+
+        try:
+            return self.driver.add_bulk(track(rows), batch_size=batch_size, progress=progress)
+        finally:
+            for daily_date in dates:
+                self._invalidate(daily_date)
+
+
+@dataclass
+class PendingWrite:
+    rows: List[Tuple[str, str, str]]
+    done: threading.Event = field(default_factory=threading.Event)
+    error: Optional[Exception] = None
+
+
+class GroupCommitDriver:
+    # makes a driver shareable between threads. calls are serialized by a lock unless the driver is
+    # thread-safe itself, adds of concurrent callers are queued and written by a single writer
+    # thread in one transaction every delay_ms milliseconds or max_rows rows. callers return once
+    # their rows are committed.
+    thread_safe = True
+
+    def __init__(self, driver, delay_ms: float = DEFAULT_GROUP_COMMIT_DELAY_MS,
+                 max_rows: int = DEFAULT_GROUP_COMMIT_MAX_ROWS):
+        self.driver = driver
+        self._delay = delay_ms / 1000
+        self._max_rows = max_rows
+        self._lock = nullcontext() if driver.thread_safe else threading.RLock()
+        self._queue = threading.Condition()
+        self._pending = []
+        self._pending_rows = 0
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="group-commit", daemon=True)
+        self._writer.start()
+
+    def __getattr__(self, name):
+        attr = getattr(self.driver, name)
+        if not callable(attr):
+            return attr
+
+        def locked(*args, **kwargs):
+            with self._lock:
+                result = attr(*args, **kwargs)
+            if isinstance(result, Iterator):
+                return self._locked_iter(result)
+            return result
+        return locked
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _locked_iter(self, iterator: Iterator) -> Iterator:
+        # generators keep reading from the driver after the call returned, every step needs the lock
+        while True:
+            with self._lock:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def close(self) -> None:
+        with self._queue:
+            self._closed = True
+            self._queue.notify()
+        self._writer.join()
+        with self._lock:
+            self.driver.close()
+
+    def add_entry(self, daily_date: str, content: str, tag: str = "") -> None:
+        self.add_entries(daily_date, [content], tag=tag)
+
+    def add_entries(self, daily_date: str, contents: List[str], tag: str = "") -> None:
+        if not contents:
+            return
+
+        # queued rows end up in add_bulk, which drops tags a driver can't store
+        self.driver.check_tag(tag)
+        write = PendingWrite(rows=[(daily_date, content, tag) for content in contents])
+        with self._queue:
+            if self._closed:
+                raise ValueError("Can't add entries, the driver is closed")
+            self._pending.append(write)
+            self._pending_rows += len(write.rows)
+            self._queue.notify()
+        write.done.wait()
+        if write.error:
+            raise write.error
+
+    def _next_batch(self) -> List[PendingWrite]:
+        with self._queue:
+            while not self._pending and not self._closed:
+                self._queue.wait()
+
+            deadline = time.monotonic() + self._delay
+            while self._pending_rows < self._max_rows and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._queue.wait(remaining)
+
+            batch, self._pending, self._pending_rows = self._pending, [], 0
+            return batch
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            # the fs driver writes one append per day and expects the rows to be grouped by date
+            rows = sorted((row for write in batch for row in write.rows), key=lambda row: row[0])
+            error = None
+            try:
+                with self._lock:
+                    self.driver.add_bulk(rows, batch_size=len(rows))
+            except Exception as err:
+                error = err
+            for write in batch:
+                write.error = error
+                write.done.set()
+
+
+def _warn_retry(operation: str, attempt: int, delay: float) -> None:
+    print(f"database is locked, retrying {operation} in {delay * 1000:.0f}ms (attempt {attempt})", file=sys.stderr)
+
+
+def _build_sqlite_driver(config: configparser.SectionProxy, shared: bool = False) -> SqliteDriver:
+    pragmas = {key[len("pragma_"):]: value for key, value in config.items() if key.startswith("pragma_")}
+    retry = RetryPolicy(retries=config.getint("retries"), base_delay_ms=config.getfloat("retry_base_ms"),
+                        max_delay_ms=config.getfloat("retry_max_ms"), on_retry=_warn_retry)
+    options = dict(profile=config["profile"], arraysize=config.getint("arraysize"), pragmas=pragmas,
+                   busy_timeout_ms=config.getint("busy_timeout_ms"), retry=retry)
+    pool_size = config.getint("pool_size")
+    if pool_size > 0:
+        return PooledSqliteDriver(config["path"], pool_size=pool_size, **options)
+    return SqliteDriver(config["path"], check_same_thread=not shared, **options)
+
+
+def _build_fs_driver(config: configparser.SectionProxy, shared: bool = False) -> FsDriver:
+    return FsDriver(config["path"], layout=config["layout"])
+
+
+DRIVERS = {
+    "sqlite": _build_sqlite_driver,
+    "fs": _build_fs_driver,
+}
+
+DEFAULT_CONFIG = {
+    "daily": {
+        "driver": DEFAULT_DRIVER,
+        "socket": DAEMON_SOCKET,
+        "cache_size": str(DEFAULT_CACHE_SIZE),
+        "group_commit_delay_ms": str(DEFAULT_GROUP_COMMIT_DELAY_MS),
+        "group_commit_max_rows": str(DEFAULT_GROUP_COMMIT_MAX_ROWS),
+        "http_host": HTTP_HOST,
+        "http_port": str(HTTP_PORT),
+    },
+    "sqlite": {
+        "path": SQLITE_DB_FILE,
+        "profile": DEFAULT_SQLITE_PROFILE,
+        "arraysize": str(DEFAULT_SQLITE_ARRAYSIZE),
+        "busy_timeout_ms": str(DEFAULT_SQLITE_BUSY_TIMEOUT_MS),
+        "retries": str(DEFAULT_SQLITE_RETRIES),
+        "retry_base_ms": str(DEFAULT_SQLITE_RETRY_BASE_MS),
+        "retry_max_ms": str(DEFAULT_SQLITE_RETRY_MAX_MS),
+        # 0 uses a single connection, more allow that many parallel readers next to one writer
+        "pool_size": "0",
+    },
+    "fs": {
+        "path": ENTRIES_DIR,
+        "layout": DEFAULT_FS_LAYOUT,
+    },
+}
+
+
+def load_config(filename: Optional[str] = None, environ=None) -> configparser.ConfigParser:
+    # precedence: defaults < config file < DAILY_* environment variables. DAILY_<SECTION>_<OPTION>
+    # sets an option of a driver section, e.g. DAILY_SQLITE_PATH, anything else lands in [daily]
+    environ = os.environ if environ is None else environ
+    config = configparser.ConfigParser(interpolation=None)
+    config.read_dict(DEFAULT_CONFIG)
+    config.read(os.path.expanduser(filename or environ.get("DAILY_CONFIG", CONFIG_FILE)))
+
+    for key, value in environ.items():
+        if not key.startswith("DAILY_") or key == "DAILY_CONFIG":
+            continue
+        name = key[len("DAILY_"):].lower()
+        section, _, option = name.partition("_")
+        if section in DRIVERS and option:
+            config[section][option] = value
+        else:
+            config["daily"][name] = value
+    return config
+
+
+def build_transfer_driver(config_file: Optional[str], name: str, path: str):
+    config = load_config(config_file)
+    config[name]["path"] = path
+    return DRIVERS[name](config[name])
+
+
+def driver_config(config: configparser.ConfigParser) -> dict:
+    # everything that decides which store a command touches, compared between client and daemon
+    name = config["daily"]["driver"]
+    options = dict(config[name])
+    options["path"] = os.path.abspath(os.path.expanduser(options["path"]))
+    return {"driver": name, **options}
+
+
+def build_driver(config: configparser.ConfigParser, shared: bool = False):
+    # a shared driver is used by several threads at once, e.g. by the daemon
+    name = config["daily"]["driver"]
+    if name not in DRIVERS:
+        raise ValueError(f"Unknown driver '{name}', choose one of {', '.join(DRIVERS)}")
+
+    driver = DRIVERS[name](config[name], shared=shared)
+    cache_size = config["daily"].getint("cache_size")
+    if cache_size > 0:
+        driver = CachingDriver(driver, maxsize=cache_size)
+    if shared:
+        driver = GroupCommitDriver(driver, delay_ms=config["daily"].getfloat("group_commit_delay_ms"),
+                                   max_rows=config["daily"].getint("group_commit_max_rows"))
+    return driver
 
 
 class Tui:
@@ -240,8 +1529,27 @@ class Tui:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
-    def __init__(self):
-        self.fzf = FzfPrompt()
+    COLORS = ["HEADER", "OKBLUE", "OKCYAN", "OKGREEN", "WARNING", "FAIL", "ENDC", "BOLD", "UNDERLINE"]
+
+    def __init__(self, color: Optional[bool] = None, stream=None):
+        self._fzf = None
+        self._stream = stream or sys.stdout
+        self._buffer = []
+        self._buffered = 0
+
+        if color is None:
+            color = self._stream.isatty() and "NO_COLOR" not in os.environ
+        if not color:
+            for name in Tui.COLORS:
+                setattr(self, name, "")
+
+    @property
+    def fzf(self):
+        # pyfzf is only needed for interactive pickers, importing it lazily keeps startup cheap
+        if self._fzf is None:
+            from pyfzf.pyfzf import FzfPrompt
+            self._fzf = FzfPrompt()
+        return self._fzf
 
     def confirm_action(self, prompt: str) -> bool:
         self.notify_warn(prompt)
@@ -255,8 +1563,22 @@ class Tui:
         except:
             return None
 
+    def _write(self, text: str) -> None:
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= OUTPUT_BUFFER_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._buffer:
+            self._stream.write("".join(self._buffer))
+            self._buffer.clear()
+            self._buffered = 0
+        self._stream.flush()
+
     def _color_print(self, color: str, msg: str) -> None:
-        print(f"{color}{msg}{self.ENDC}")
+        self._write(f"{color}{msg}{self.ENDC}\n")
+        self._flush()
 
     def pick_entry(self, choices: List[Tuple[int, str]]) -> Optional[str]:
         choices = [f"{result[0]}, {result[1]}" for result in choices]
@@ -272,16 +1594,55 @@ class Tui:
         except:
             return None
 
-    def render_output(self, result: Result) -> None:
-        if result.warnings:
-            for warning in result.warnings:
-                self.notify_warn(warning)
+    def _write_result(self, result: Result) -> None:
+        for warning in result.warnings:
+            self._write(f"{self.WARNING}{warning}{self.ENDC}\n")
 
         for i in result.items:
             end = "\n"
             if i.endswith("\n"):
                 end = ""
-            print(f"- {i}", end=end)
+            self._write(f"- {i}{end}")
+
+    def render_output(self, result: Result) -> None:
+        self._write_result(result)
+        self._flush()
+
+    def render_range(self, results: Iterator[Result]) -> None:
+        for result in results:
+            self._write(f"{self.HEADER}{result.daily_date}{self.ENDC}\n")
+            self._write_result(result)
+        self._flush()
+
+    def render_rows(self, rows: Iterator[Tuple[str, int, str, str]], output_format: str) -> None:
+        if output_format == "ndjson":
+            for row in rows:
+                self._write(json.dumps(dict(zip(ROW_FIELDS, row))) + "\n")
+        else:
+            import csv
+
+            # the csv module only needs an object with a write method, that way rows go through our buffer
+            writer = csv.writer(SimpleNamespace(write=self._write),
+                                dialect="excel-tab" if output_format == "tsv" else "excel", lineterminator="\n")
+            writer.writerow(ROW_FIELDS)
+            for row in rows:
+                writer.writerow(row)
+        self._flush()
+
+    def render_search(self, results: List[Tuple[str, str]]) -> None:
+        if not results:
+            self.notify_warn("Nothing found")
+            return
+
+        for daily_date, snippet in results:
+            self._write(f"{self.HEADER}{daily_date}{self.ENDC} {snippet}\n")
+        self._flush()
+
+    def render_metrics(self, metrics: RetryMetrics) -> None:
+        self._write(f"{self.HEADER}write retries{self.ENDC} {metrics.retries}\n")
+        self._write(f"{self.HEADER}failed writes{self.ENDC} {metrics.failures}\n")
+        self._write(f"{self.HEADER}wait time{self.ENDC} {metrics.wait_seconds * 1000:.0f}ms\n")
+        self._flush()
 
     def notify_fail(self, msg: str) -> None:
         self._color_print(self.FAIL, msg)
@@ -294,12 +1655,18 @@ class Tui:
 
 
 def run_subcommands(daily: Daily, ui: Tui, arg: argparse.Namespace, parsed_date: str):
+    # checked upfront, reading entries is lazy and would fail halfway through rendering
+    try:
+        daily.check_tag(getattr(arg, "tag", None))
+    except UnsupportedOperationException as err:
+        ui.notify_fail(str(err))
+        return
+
     if arg.command == "add":
         if not arg.message:
             ui.notify_fail("No message provided")
             return
-        for messages in arg.message:
-            daily.add_entry(parsed_date, " ".join(messages))
+        daily.add_entries(parsed_date, [" ".join(messages) for messages in arg.message], tag=arg.tag)
     elif arg.command == "edit":
         results = daily.get_ids(parsed_date)
         choice = ui.pick_entry(results)
@@ -333,46 +1700,565 @@ def run_subcommands(daily: Daily, ui: Tui, arg: argparse.Namespace, parsed_date:
             ui.notify_ok(f"Deleted {nuked_entries} entries")
         else:
             ui.notify_warn("There were no entries to delete")
+    elif arg.command == "migrate":
+        try:
+            moved = daily.migrate_layout(arg.layout)
+        except UnsupportedOperationException as err:
+            ui.notify_fail(str(err))
+            return
+        ui.notify_ok(f"Moved {moved} files to the {arg.layout} layout, "
+                     f"set 'layout = {arg.layout}' in the [fs] section of your config")
+
+    elif arg.command in ["export", "import"]:
+        def report_progress(count: int) -> None:
+            print(f"\r{count} entries transferred", end="", file=sys.stderr, flush=True)
+
+        other = build_transfer_driver(arg.config, arg.other_driver, arg.path)
+        with other:
+            if arg.command == "export":
+                count = daily.export_entries(other, batch_size=arg.batch_size, progress=report_progress)
+            else:
+                count = daily.import_entries(other, batch_size=arg.batch_size, progress=report_progress)
+        if count:
+            print(file=sys.stderr)
+        ui.notify_ok(f"Transferred {count} entries")
+
+    elif arg.command == "metrics":
+        ui.render_metrics(daily.retry_metrics())
+    elif arg.command == "search":
+        try:
+            results = daily.search(" ".join(arg.query), arg.limit)
+        except InvalidQueryException as err:
+            ui.notify_fail(f"Invalid search query: {err}")
+            return
+        except UnsupportedOperationException as err:
+            ui.notify_fail(str(err))
+            return
+        ui.render_search(results)
+
+    elif arg.command == "get" and arg.format != "text":
+        start, end = (arg.date_from, arg.date_to) if arg.date_from else (parsed_date, parsed_date)
+        ui.render_rows(daily.iter_rows(start, end, tag=arg.tag), arg.format)
+    elif arg.command == "get" and arg.date_from:
+        ui.render_range(daily.get_range(arg.date_from, arg.date_to, tag=arg.tag))
     else:
-        result = daily.get_entry(parsed_date)
+        result = daily.get_entry(parsed_date, tag=getattr(arg, "tag", None))
         ui.render_output(result)
 
 
-def main():
-    arg = parse_args()
-
-    # todo: make configurable
-    driver = SqliteDriver(SQLITE_DB_FILE)
-    daily = Daily(driver)
-
-    ui = Tui()
+def execute(daily: Daily, ui: Tui, arg: argparse.Namespace) -> int:
     try:
         parsed_date = daily.translate_date(arg.date)
+        if getattr(arg, "date_from", None):
+            arg.date_from = daily.translate_date(arg.date_from)
+            arg.date_to = daily.translate_date(arg.date_to)
+            if arg.date_from > arg.date_to:
+                raise IllegalDateException(f"Start date {arg.date_from} is after end date {arg.date_to}")
     except IllegalDateException as err:
-        ui._color_print(Tui.FAIL, str(err))
-        sys.exit(1)
+        ui.notify_fail(str(err))
+        return 1
 
     run_subcommands(daily, ui, arg, parsed_date)
+    return 0
+
+
+class DaemonServer:
+    # every client is handled in its own thread so concurrent adds can be committed together.
+    # wraps the socketserver instead of subclassing it, so that only 'daily serve' imports it.
+    def __init__(self, socket_path: str, daily: Daily, driver_config: dict):
+        import socketserver
+
+        self.daily = daily
+        self.driver_config = driver_config
+        self._server = socketserver.ThreadingUnixStreamServer(socket_path, self._handle)
+        self._server.daemon_threads = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.server_close()
 
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
 
-def parse_args() -> argparse.Namespace:
+    def shutdown(self) -> None:
+        self._server.shutdown()
+
+    def _handle(self, connection, client_address, server) -> None:
+        # called by the socketserver for every connection, which closes it afterwards. the greeting
+        # tells clients that the daemon is alive before they hand over a command.
+        try:
+            connection.sendall(DAEMON_GREETING)
+        except OSError:
+            # daemon_is_running() only connects and hangs up
+            return
+        with connection.makefile("rb") as rfile:
+            line = rfile.readline()
+        if not line:
+            return
+
+        request = json.loads(line)
+        if request.get("driver") != self.driver_config:
+            # the client resolved another driver, path or pragmas than the daemon was started with
+            connection.sendall(json.dumps({"refused": "driver config differs from the daemon's"}).encode())
+            return
+
+        output = io.StringIO()
+        ui = Tui(color=request["color"], stream=output)
+        try:
+            code = execute(self.daily, ui, parse_args(request["argv"]))
+        except SystemExit as err:
+            code = err.code if isinstance(err.code, int) else 1
+        except Exception as err:
+            ui.notify_fail(f"daemon failed to run command: {err}")
+            code = 1
+        ui._flush()
+        connection.sendall(json.dumps({"output": output.getvalue(), "code": code}).encode())
+
+
+def serve(daily: Daily, ui: Tui, socket_path: str, driver_config: dict) -> None:
+    if os.path.exists(socket_path):
+        if daemon_is_running(socket_path):
+            ui.notify_fail(f"Another daemon is already listening on {socket_path}")
+            sys.exit(1)
+        os.remove(socket_path)
+
+    import signal
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with DaemonServer(socket_path, daily, driver_config) as server:
+        ui.notify_ok(f"Listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+
+
+def daemon_is_running(socket_path: str) -> bool:
+    import socket
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            return True
+    except OSError:
+        return False
+
+
+def forward_to_daemon(socket_path: str, argv: List[str], color: bool, driver_config: dict,
+                      timeout: float = DAEMON_TIMEOUT) -> Optional[Tuple[str, int]]:
+    # returns None whenever the command has to run in-process: no daemon, a daemon that doesn't
+    # greet in time or one that serves another driver config. once the command has been sent the
+    # daemon may have run it, so failures from there on raise OSError instead of falling back.
+    if not os.path.exists(socket_path):
+        return None
+
+    # imported here, without a daemon the socket module is never needed
+    import socket
+
+    request = json.dumps({"argv": argv, "color": color, "driver": driver_config}).encode() + b"\n"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock, sock.makefile("rb") as rfile:
+        try:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            if rfile.readline() != DAEMON_GREETING:
+                return None
+        except OSError:
+            return None
+
+        # the command may take as long as it takes
+        sock.settimeout(None)
+        sock.sendall(request)
+        sock.shutdown(socket.SHUT_WR)
+        data = rfile.read()
+
+    if not data:
+        raise ConnectionError("daemon closed the connection without answering")
+    try:
+        response = json.loads(data)
+    except ValueError:
+        raise ConnectionError("daemon sent an incomplete answer") from None
+    if "refused" in response:
+        return None
+    return response["output"], response["code"]
+
+
+@dataclass
+class HttpRequest:
+    method: str
+    path: str
+    query: dict
+    headers: dict
+    body: bytes = b""
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.headers.get(":version") == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+class HttpServer:
+    # a small json api on top of AsyncDaily for dashboards that poll frequently. every GET carries a weak
+    # ETag made of the driver's data version, the writes served by this process (sqlite's data_version
+    # does not change on our own commits) and today's date (relative dates move at midnight). a poll
+    # whose If-None-Match still matches gets a 304 without running a query.
+    #
+    #   GET  /entries/<date>[?tag=]              entries of a day, falls back to the latest day like 'get'
+    #   GET  /range?from=<date>[&to=<date>][&tag=] entries per day of a date range
+    #   GET  /search?q=<query>[&limit=]          full-text search
+    #   GET  /metrics                            retries, failures and wait time of locked sqlite writes
+    #   POST /entries/<date>                     {"entries": ["..."], "tag": ""} adds entries
+    def __init__(self, daily: AsyncDaily, host: str = HTTP_HOST, port: int = HTTP_PORT):
+        self.daily = daily
+        self.host = host
+        self.port = port
+        self._writes = 0
+        self._server = None
+        self._hostnames = {self.host}
+        if self.host in LOOPBACK_HOSTS | WILDCARD_HOSTS:
+            self._hostnames |= LOOPBACK_HOSTS
+        if self.host in WILDCARD_HOSTS:
+            import socket
+
+            self._hostnames |= {socket.gethostname().lower(), socket.getfqdn().lower()}
+
+    async def start(self) -> int:
+        import asyncio
+
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def serve_forever(self) -> None:
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer) -> None:
+        import asyncio
+
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), HTTP_KEEPALIVE_TIMEOUT)
+                except HttpError as err:
+                    writer.write(self._encode(err.status, {"error": str(err)}, {}, keep_alive=False))
+                    await writer.drain()
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+
+                status, body, headers = await self._respond(request)
+                writer.write(self._encode(status, body, headers, keep_alive=request.keep_alive))
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader) -> Optional[HttpRequest]:
+        from urllib.parse import parse_qsl, unquote, urlsplit
+
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+
+        headers = {":version": version}
+        line = await reader.readline()
+        while line.strip():
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+            line = await reader.readline()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            raise HttpError(400, "Malformed Content-Length header")
+        if length > HTTP_MAX_BODY_SIZE:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        return HttpRequest(method=method, path=unquote(url.path), query=dict(parse_qsl(url.query)),
+                           headers=headers, body=body)
+
+    @staticmethod
+    def _encode(status: int, body: Optional[dict], headers: dict, keep_alive: bool) -> bytes:
+        from http import HTTPStatus
+
+        payload = json.dumps(body).encode() if body is not None else b""
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if body is not None:
+            lines.extend([f"Content-Length: {len(payload)}", "Content-Type: application/json"])
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload
+
+    async def _etag(self) -> str:
+        version = await self.daily.data_version()
+        return f'W/"{version}-{self._writes}-{Daily.compute_date()}"'
+
+    def _is_served_here(self, url) -> bool:
+        try:
+            port = url.port or {"https": 443}.get(url.scheme, 80)
+        except ValueError:
+            return False
+        return url.hostname in self._hostnames and port == self.port
+
+    def _check_origin(self, request: HttpRequest) -> None:
+        # a web page must neither reach us through a rebound dns name nor send cross-origin requests
+        from urllib.parse import urlsplit
+
+        host = request.headers.get("host")
+        if host is not None and not self._is_served_here(urlsplit(f"//{host}")):
+            raise HttpError(403, f"Host {host} is not served here")
+        origin = request.headers.get("origin")
+        if origin is not None and not self._is_served_here(urlsplit(origin)):
+            raise HttpError(403, f"Origin {origin} is not allowed")
+
+    async def _respond(self, request: HttpRequest) -> Tuple[int, Optional[dict], dict]:
+        try:
+            self._check_origin(request)
+            if request.method == "GET" and request.path == "/metrics":
+                # counters change without any data changing, never answered with a 304
+                return 200, asdict(self.daily.retry_metrics()), {"Cache-Control": "no-store"}
+            if request.method == "GET":
+                etag = await self._etag()
+                headers = {"ETag": etag, "Cache-Control": "no-cache"}
+                if request.headers.get("if-none-match") == etag:
+                    return 304, None, headers
+                return 200, await self._get(request), headers
+            if request.method == "POST":
+                return 201, await self._post(request), {}
+            raise HttpError(405, f"Method {request.method} not allowed")
+        except HttpError as err:
+            return err.status, {"error": str(err)}, {}
+        except IllegalDateException as err:
+            return 400, {"error": str(err)}, {}
+        except InvalidQueryException as err:
+            return 400, {"error": f"Invalid search query: {err}"}, {}
+        except UnsupportedOperationException as err:
+            return 501, {"error": str(err)}, {}
+        except Exception as err:
+            return 500, {"error": f"failed to handle request: {err}"}, {}
+
+    async def _get(self, request: HttpRequest) -> dict:
+        query = request.query
+        if request.path.startswith("/entries/"):
+            daily_date = await self.daily.translate_date(request.path[len("/entries/"):])
+            result = await self.daily.get_entry(daily_date, tag=query.get("tag"))
+            # the fs driver hands out raw lines, clients get the same entries from every driver
+            entries = [entry.rstrip("\n") for entry in result.items]
+            return {"date": result.daily_date or None, "entries": entries, "warnings": result.warnings}
+        if request.path == "/range":
+            if "from" not in query:
+                raise HttpError(400, "Missing parameter 'from'")
+            start = await self.daily.translate_date(query["from"])
+            end = await self.daily.translate_date(query.get("to", "today"))
+            days = [{"date": result.daily_date, "entries": [entry.rstrip("\n") for entry in result.items]}
+                    async for result in self.daily.get_range(start, end, tag=query.get("tag"))]
+            return {"days": days}
+        if request.path == "/search":
+            if not query.get("q"):
+                raise HttpError(400, "Missing parameter 'q'")
+            try:
+                limit = int(query.get("limit", 20))
+            except ValueError:
+                raise HttpError(400, "Parameter 'limit' must be a number")
+            results = await self.daily.search(query["q"], limit)
+            return {"results": [{"date": daily_date, "snippet": snippet} for daily_date, snippet in results]}
+        raise HttpError(404, f"Unknown path {request.path}")
+
+    async def _post(self, request: HttpRequest) -> dict:
+        if not request.path.startswith("/entries/"):
+            raise HttpError(404, f"Unknown path {request.path}")
+        # unlike text/plain or form posts a json body can't be sent cross-origin without a cors preflight
+        if request.headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+            raise HttpError(415, "Expected Content-Type: application/json")
+        try:
+            body = json.loads(request.body or b"{}")
+        except ValueError:
+            raise HttpError(400, "Request body is not valid json")
+        entries = body.get("entries") if isinstance(body, dict) else None
+        tag = body.get("tag", "") if isinstance(body, dict) else ""
+        if not entries or not isinstance(tag, str) or not all(isinstance(entry, str) for entry in entries):
+            raise HttpError(400, "Expected a body like {\"entries\": [\"...\"], \"tag\": \"\"}")
+
+        daily_date = await self.daily.translate_date(request.path[len("/entries/"):])
+        try:
+            await self.daily.add_entries(daily_date, entries, tag=tag)
+        finally:
+            # a failed batch may still have been written partially, never hand out a stale etag
+            self._writes += 1
+        return {"date": daily_date, "added": len(entries)}
+
+
+def serve_http(daily: Daily, ui: Tui, host: str, port: int) -> None:
+    import asyncio
+    import signal
+
+    async def run():
+        async with AsyncDaily(daily) as async_daily:
+            server = HttpServer(async_daily, host, port)
+            bound = await server.start()
+            ui.notify_ok(f"Listening on http://{host}:{bound}")
+            await server.serve_forever()
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def print_startup_profile(timings: List[Tuple[str, float]]) -> None:
+    for name, duration in timings:
+        print(f"{name}: {duration * 1000:.2f}ms", file=sys.stderr)
+
+
+def main():
+    main_start = time.perf_counter()
+    arg = parse_args()
+    config = load_config(arg.config)
+    if arg.driver:
+        config["daily"]["driver"] = arg.driver
+    if arg.sqlite_profile:
+        config["sqlite"]["profile"] = arg.sqlite_profile
+    if arg.socket:
+        config["daily"]["socket"] = arg.socket
+    socket_path = os.path.expanduser(config["daily"]["socket"])
+    color = not arg.no_color and sys.stdout.isatty() and "NO_COLOR" not in os.environ
+
+    daemon_start = time.perf_counter()
+    if arg.command in DAEMON_COMMANDS and not arg.no_daemon:
+        try:
+            response = forward_to_daemon(socket_path, sys.argv[1:], color, driver_config(config))
+        except OSError as err:
+            # not run again in-process, the daemon might have run it already
+            Tui(color=color).notify_fail(f"Lost the daemon while it ran the command, it may or may not have run: {err}")
+            sys.exit(1)
+        if response is not None:
+            output, code = response
+            sys.stdout.write(output)
+            if arg.profile_startup:
+                print_startup_profile([
+                    ("imports", _IMPORT_END - _IMPORT_START),
+                    ("parse args", daemon_start - main_start),
+                    ("daemon round trip", time.perf_counter() - daemon_start),
+                ])
+            sys.exit(code)
+
+    driver_start = time.perf_counter()
+    try:
+        driver = build_driver(config, shared=arg.command in ["serve", "http"])
+    except ValueError as err:
+        Tui(color=color).notify_fail(str(err))
+        sys.exit(1)
+
+    with Daily(driver) as daily:
+        ui_start = time.perf_counter()
+        ui = Tui(color=color)
+        if arg.profile_startup:
+            print_startup_profile([
+                ("imports", _IMPORT_END - _IMPORT_START),
+                ("parse args", daemon_start - main_start),
+                ("daemon lookup", driver_start - daemon_start),
+                ("driver init", ui_start - driver_start),
+                ("ui init", time.perf_counter() - ui_start),
+            ])
+
+        if arg.command == "serve":
+            serve(daily, ui, socket_path, driver_config(config))
+            return
+        if arg.command == "http":
+            serve_http(daily, ui, arg.host or config["daily"]["http_host"],
+                       arg.port if arg.port is not None else config["daily"].getint("http_port"))
+            return
+
+        code = execute(daily, ui, arg)
+        if code:
+            sys.exit(code)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser()
 
     parser.add_argument("-d", '--date', type=str, help="specify a date the command applies to",
                         default="today", action="store")
+    parser.add_argument('--config', type=str, help=f"path of the config file, defaults to {CONFIG_FILE}")
+    parser.add_argument('--driver', type=str, help="storage backend to use", choices=DRIVERS.keys())
+    parser.add_argument('--sqlite-profile', type=str, help="pragma profile applied to the sqlite database",
+                        choices=SQLITE_PRAGMA_PROFILES.keys())
+    parser.add_argument('--no-color', help="disable colored output, the default when stdout is not a tty",
+                        action="store_true")
+    parser.add_argument('--socket', type=str, help="unix socket of the daemon started with 'daily serve'")
+    parser.add_argument('--no-daemon', help="always run in-process, even if a daemon is listening",
+                        action="store_true")
+    parser.add_argument('--profile-startup', help="print import and initialization timings to stderr",
+                        action="store_true")
     subparsers = parser.add_subparsers(dest="command")
 
     parser_add = subparsers.add_parser('add', help='add one or more entries for a given day')
     parser_add.add_argument("-m", help='express the work item', dest="message",
                             nargs="+", action="append")
-
-    subparsers.add_parser('get', help='read entries for a given day')
+    parser_add.add_argument("-t", "--tag", help='tag the entries, e.g. with a project or "incident"', default="")
+
+    parser_get = subparsers.add_parser('get', help='read entries for a given day')
+    parser_get.add_argument("--from", help='read all entries starting from this date', dest="date_from")
+    parser_get.add_argument("--to", help='read all entries up to this date, used with --from', dest="date_to",
+                            default="today")
+    parser_get.add_argument("-t", "--tag", help='only read entries with the given tag')
+    parser_get.add_argument("-f", "--format", help='output format, the machine readable formats stream one row '
+                                                   'per entry', choices=OUTPUT_FORMATS, default="text")
     subparsers.add_parser('edit', help='edit entries for a given day')
+
+    parser_search = subparsers.add_parser('search', help='full-text search over all entries')
+    parser_search.add_argument("query", help='the search terms', nargs="+")
+    parser_search.add_argument("-n", "--limit", help='maximum number of results', type=int, default=20)
     subparsers.add_parser('nuke', help='delete entries for a given day')
     subparsers.add_parser('remove', help='delete entries for a given day')
-
-    return parser.parse_args()
-
+    parser_export = subparsers.add_parser('export', help='copy all entries into another driver')
+    parser_export.add_argument("--to", help='the driver to copy the entries to', dest="other_driver",
+                               choices=DRIVERS.keys(), required=True)
+    parser_import = subparsers.add_parser('import', help='copy all entries of another driver into this one')
+    parser_import.add_argument("--from", help='the driver to copy the entries from', dest="other_driver",
+                               choices=DRIVERS.keys(), required=True)
+    for parser_transfer in [parser_export, parser_import]:
+        parser_transfer.add_argument("--path", help='database file or entries directory of the other driver',
+                                     required=True)
+        parser_transfer.add_argument("--batch-size", help='number of entries written per transaction', type=int,
+                                     default=DEFAULT_BATCH_SIZE)
+
+    parser_migrate = subparsers.add_parser('migrate', help='move the files of the fs driver to another layout')
+    parser_migrate.add_argument("--layout", help='the layout to migrate to', choices=FS_LAYOUTS, required=True)
+    subparsers.add_parser('serve', help='keep a warm daemon running that add, get and search are forwarded to')
+    subparsers.add_parser('metrics', help="show lock contention of sqlite writes, the daemon's if one is running")
+    parser_http = subparsers.add_parser('http', help='serve a json api for get, range, search and add over http')
+    parser_http.add_argument("--host", help=f'address to listen on, defaults to {HTTP_HOST}')
+    parser_http.add_argument("--port", help=f'port to listen on, defaults to {HTTP_PORT}', type=int)
+
+    return parser.parse_args(argv)
+
+
+_IMPORT_END = time.perf_counter()
 
 if __name__ == '__main__':
     main()
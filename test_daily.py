@@ -1,5 +1,21 @@
-from unittest import TestCase
-from daily import Daily, IllegalDateException
+import asyncio
+import http.client
+import io
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stderr
+from unittest import IsolatedAsyncioTestCase, TestCase, mock
+from daily import (AsyncDaily, CachingDriver, DaemonServer, Daily, FsDriver, GroupCommitDriver, HttpServer,
+                   IllegalDateException, Result, PooledSqliteDriver, RetryPolicy, SqliteDriver, SQLITE_MIGRATIONS, Tui,
+                   UnsupportedOperationException, build_driver, driver_config, execute, forward_to_daemon, load_config,
+                   parse_args, transfer)
 
 
 class TestDaily(TestCase):
@@ -29,9 +45,849 @@ class TestDaily(TestCase):
         except IllegalDateException:
             pass
 
+    def test_get_range_invalid_order(self):
+        daily = Daily(SqliteDriver(":memory:"))
+        self.assertRaises(IllegalDateException, daily.get_range, "2021-06-02", "2021-06-01")
+        self.assertRaises(IllegalDateException, daily.iter_rows, "2021-06-02", "2021-06-01")
+
+    def test_cli_reports_invalid_range_order(self):
+        daily = Daily(SqliteDriver(":memory:"))
+        message = "Start date 2030-01-01 is after end date 2021-06-01\n"
+        for argv in [["get", "--from", "2030-01-01", "--to", "2021-06-01"],
+                     ["get", "--from", "2030-01-01", "--to", "2021-06-01", "-f", "ndjson"]]:
+            output = io.StringIO()
+            ui = Tui(color=False, stream=output)
+            self.assertEqual(1, execute(daily, ui, parse_args(argv)))
+            ui._flush()
+            self.assertEqual(message, output.getvalue())
+
     def test_validate_filename_nil(self):
         try:
             Daily._validate_date(None)
             self.fail("Expected validation to fail")
         except IllegalDateException:
-            pass
\ No newline at end of file
+            pass
+
+
+class TestTui(TestCase):
+    def test_fzf_not_imported_eagerly(self):
+        code = "import sys, daily; daily.Tui(); sys.exit('pyfzf' in sys.modules)"
+        self.assertEqual(0, subprocess.run([sys.executable, "-c", code]).returncode)
+
+    def test_render_output_no_color(self):
+        stream = io.StringIO()
+        Tui(color=False, stream=stream).render_output(Result(items=["a", "b\n"], warnings=["careful"]))
+        self.assertEqual("careful\n- a\n- b\n", stream.getvalue())
+
+    def test_render_output_color(self):
+        stream = io.StringIO()
+        Tui(color=True, stream=stream).render_output(Result(items=["a"], warnings=["careful"]))
+        self.assertEqual(f"{Tui.WARNING}careful{Tui.ENDC}\n- a\n", stream.getvalue())
+
+    def test_render_rows(self):
+        rows = [("2021-06-01", 1, "incident", 'said "hi"'), ("2021-06-02", 7, "", "a\tb")]
+        expected = {
+            "ndjson": '{"date": "2021-06-01", "id": 1, "tag": "incident", "desc": "said \\"hi\\""}\n'
+                      '{"date": "2021-06-02", "id": 7, "tag": "", "desc": "a\\tb"}\n',
+            "csv": 'date,id,tag,desc\n2021-06-01,1,incident,"said ""hi"""\n2021-06-02,7,,a\tb\n',
+            "tsv": 'date\tid\ttag\tdesc\n2021-06-01\t1\tincident\t"said ""hi"""\n2021-06-02\t7\t\t"a\tb"\n',
+        }
+        for output_format, output in expected.items():
+            stream = io.StringIO()
+            Tui(color=False, stream=stream).render_rows(iter(rows), output_format)
+            self.assertEqual(output, stream.getvalue(), output_format)
+
+    def test_color_auto_detect(self):
+        stream = io.StringIO()
+        Tui(stream=stream).notify_ok("done")
+        self.assertEqual("done\n", stream.getvalue())
+
+
+class TestConfig(TestCase):
+    def test_defaults(self):
+        config = load_config(os.devnull, environ={})
+        self.assertEqual("sqlite", config["daily"]["driver"])
+        self.assertEqual("safe", config["sqlite"]["profile"])
+
+    def test_file_and_env_overrides(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "config.ini")
+            with open(filename, "w") as config_file:
+                config_file.write("[daily]\ndriver = fs\n[fs]\npath = /from/file\n[sqlite]\nprofile = fast\n")
+            config = load_config(filename, environ={"DAILY_FS_PATH": tmp_dir, "DAILY_SOCKET": "/tmp/x.sock"})
+            self.assertEqual("fs", config["daily"]["driver"])
+            self.assertEqual(tmp_dir, config["fs"]["path"])
+            self.assertEqual("fast", config["sqlite"]["profile"])
+            self.assertEqual("/tmp/x.sock", config["daily"]["socket"])
+            self.assertIsInstance(build_driver(config).driver, FsDriver)
+
+    def test_sqlite_pragma_overrides(self):
+        config = load_config(os.devnull, environ={"DAILY_SQLITE_PATH": ":memory:",
+                                                  "DAILY_SQLITE_PRAGMA_CACHE_SIZE": "-1234"})
+        with build_driver(config) as driver:
+            self.assertEqual(-1234, driver._con.execute('PRAGMA cache_size').fetchone()[0])
+
+    def test_cache_disabled(self):
+        config = load_config(os.devnull, environ={"DAILY_SQLITE_PATH": ":memory:", "DAILY_CACHE_SIZE": "0"})
+        with build_driver(config) as driver:
+            self.assertIsInstance(driver, SqliteDriver)
+
+    def test_unknown_driver(self):
+        config = load_config(os.devnull, environ={"DAILY_DRIVER": "mongodb"})
+        self.assertRaises(ValueError, build_driver, config)
+
+    def test_sqlite_not_imported_for_fs_driver(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            code = ("import sys, daily; daily.build_driver(daily.load_config(environ={'DAILY_DRIVER': 'fs', "
+                    f"'DAILY_FS_PATH': '{tmp_dir}'}})); sys.exit('sqlite3' in sys.modules)")
+            self.assertEqual(0, subprocess.run([sys.executable, "-c", code]).returncode)
+
+
+class TestCachingDriver(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, "daily.db")
+        self.driver = CachingDriver(SqliteDriver(self.filename), maxsize=2)
+
+    def tearDown(self):
+        self.driver.close()
+        self.tmp_dir.cleanup()
+
+    def test_write_through_invalidation(self):
+        self.assertFalse(self.driver.has_entry("2021-06-01"))
+        self.assertIsNone(self.driver.latest_date())
+        self.driver.add_entry("2021-06-01", "a")
+        self.assertTrue(self.driver.has_entry("2021-06-01"))
+        self.assertEqual("2021-06-01", self.driver.latest_date())
+        entry_id = self.driver.get_ids("2021-06-01")[0][0]
+        self.driver.edit_entry("2021-06-01", entry_id, "b")
+        self.assertEqual(["b"], self.driver.get_entry("2021-06-01"))
+        self.driver.nuke_entries("2021-06-01")
+        self.assertEqual([], list(self.driver.iter_entry("2021-06-01")))
+
+    def test_serves_from_cache(self):
+        self.driver.add_entry("2021-06-01", "a")
+        self.assertEqual(["a"], self.driver.get_entry("2021-06-01"))
+        self.driver.driver._con.execute('DELETE FROM daily')
+        self.assertEqual(["a"], self.driver.get_entry("2021-06-01"))
+
+    def test_lru_eviction(self):
+        for daily_date in ["2021-06-01", "2021-06-02", "2021-06-03"]:
+            self.driver.get_entry(daily_date)
+        self.assertEqual([("2021-06-02", None), ("2021-06-03", None)], list(self.driver._entries))
+
+    def test_detects_writes_of_other_connections(self):
+        self.assertEqual([], self.driver.get_entry("2021-06-01"))
+        with SqliteDriver(self.filename) as other:
+            other.add_entry("2021-06-01", "a")
+        self.assertEqual(["a"], self.driver.get_entry("2021-06-01"))
+
+
+class TestSqliteRetry(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, "daily.db")
+        self.retries = []
+        policy = RetryPolicy(retries=50, base_delay_ms=1, max_delay_ms=5,
+                             on_retry=lambda *args: self.retries.append(args))
+        self.driver = SqliteDriver(self.filename, busy_timeout_ms=0, retry=policy)
+        self.blocker = sqlite3.connect(self.filename, isolation_level=None, check_same_thread=False)
+
+    def tearDown(self):
+        self.blocker.close()
+        self.driver.close()
+        self.tmp_dir.cleanup()
+
+    def test_write_waits_for_lock(self):
+        self.blocker.execute("BEGIN IMMEDIATE")
+        timer = threading.Timer(0.05, lambda: self.blocker.execute("COMMIT"))
+        timer.start()
+        self.driver.add_entry("2021-06-01", "a")
+        timer.join()
+
+        self.assertEqual(["a"], self.driver.get_entry("2021-06-01"))
+        self.assertGreater(self.driver.retry_metrics.retries, 0)
+        self.assertGreater(self.driver.retry_metrics.wait_seconds, 0)
+        self.assertEqual(0, self.driver.retry_metrics.failures)
+        self.assertEqual(("add_entry", 1), self.retries[0][:2])
+
+    def test_gives_up_after_retries(self):
+        self.driver._retry.retries = 2
+        self.blocker.execute("BEGIN IMMEDIATE")
+        with self.assertRaises(sqlite3.OperationalError):
+            self.driver.add_entries("2021-06-01", ["a", "b"])
+        self.blocker.execute("COMMIT")
+
+        self.assertEqual(2, self.driver.retry_metrics.retries)
+        self.assertEqual(1, self.driver.retry_metrics.failures)
+        self.driver.add_entry("2021-06-01", "c")
+        self.assertEqual(["c"], self.driver.get_entry("2021-06-01"))
+
+    def test_configured_driver_warns_and_reports(self):
+        environ = {"DAILY_SQLITE_PATH": self.filename, "DAILY_SQLITE_BUSY_TIMEOUT_MS": "0",
+                   "DAILY_SQLITE_RETRY_BASE_MS": "1", "DAILY_SQLITE_RETRY_MAX_MS": "5", "DAILY_SQLITE_RETRIES": "50"}
+        with Daily(build_driver(load_config(os.devnull, environ=environ))) as daily:
+            self.blocker.execute("BEGIN IMMEDIATE")
+            timer = threading.Timer(0.05, lambda: self.blocker.execute("COMMIT"))
+            timer.start()
+            stderr = io.StringIO()
+            with redirect_stderr(stderr):
+                daily.add_entry("2021-06-01", "a")
+            timer.join()
+            self.assertIn("database is locked, retrying add_entry", stderr.getvalue())
+
+            output = io.StringIO()
+            ui = Tui(color=False, stream=output)
+            execute(daily, ui, parse_args(["metrics"]))
+            self.assertIn(f"write retries {daily.retry_metrics().retries}\n", output.getvalue())
+            self.assertGreater(daily.retry_metrics().retries, 0)
+
+    def test_delay_is_bounded(self):
+        policy = RetryPolicy(base_delay_ms=10, max_delay_ms=40)
+        for attempt in range(10):
+            self.assertLessEqual(policy.delay(attempt), 0.04)
+
+
+class TestPooledSqliteDriver(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.driver = PooledSqliteDriver(os.path.join(self.tmp_dir.name, "daily.db"), pool_size=2)
+
+    def tearDown(self):
+        self.driver.close()
+        self.tmp_dir.cleanup()
+
+    def test_readers_see_writes(self):
+        self.driver.add_entries("2021-06-01", ["a", "b"])
+        self.assertEqual(["a", "b"], self.driver.get_entry("2021-06-01"))
+        self.assertTrue(self.driver.has_entry("2021-06-01"))
+
+    def test_parallel_readers_are_bounded(self):
+        self.driver.add_entries("2021-06-01", [str(i) for i in range(100)])
+        results = []
+
+        def read():
+            for _ in range(20):
+                results.append(len(self.driver.get_entry("2021-06-01")))
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([100] * 160, results)
+        self.assertEqual(2, len(self.driver._connections))
+
+    def test_data_version_is_comparable_between_calls(self):
+        self.driver.add_entries("2021-06-01", ["a", "b"])
+        before = self.driver.data_version()
+        reading = self.driver.iter_entry("2021-06-01")
+        next(reading)
+        with sqlite3.connect(self.driver._filename) as other:
+            other.execute("INSERT INTO daily VALUES (NULL, 20210602, 'c', '')")
+        self.assertNotEqual(before, self.driver.data_version())
+        reading.close()
+
+    def test_open_iterators_hold_their_connection(self):
+        self.driver.add_entries("2021-06-01", ["a", "b"])
+        first = self.driver.iter_entry("2021-06-01")
+        second = self.driver.iter_entry("2021-06-01")
+        self.assertEqual("a", next(first))
+        self.assertEqual("a", next(second))
+        self.assertEqual(0, self.driver._readers.qsize())
+        self.assertEqual(["b"], list(first))
+        self.assertEqual(1, self.driver._readers.qsize())
+
+    def test_built_from_config(self):
+        config = load_config(os.devnull, environ={"DAILY_SQLITE_PATH": os.path.join(self.tmp_dir.name, "other.db"),
+                                                  "DAILY_SQLITE_POOL_SIZE": "3", "DAILY_CACHE_SIZE": "0"})
+        with build_driver(config, shared=True) as driver:
+            self.assertIsInstance(driver.driver, PooledSqliteDriver)
+            self.assertTrue(driver.thread_safe)
+
+
+class TestGroupCommitDriver(TestCase):
+    def test_concurrent_adds_are_committed_together(self):
+        sqlite = SqliteDriver(":memory:", check_same_thread=False)
+        with GroupCommitDriver(sqlite, delay_ms=50, max_rows=1000) as driver:
+            with mock.patch.object(sqlite, "add_bulk", wraps=sqlite.add_bulk) as add_bulk:
+                threads = [threading.Thread(target=driver.add_entry, args=(f"2021-06-0{i % 3 + 1}", f"entry {i}"))
+                           for i in range(10)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.assertEqual(1, add_bulk.call_count)
+            self.assertEqual(10, len(list(driver.iter_rows("2021-06-01", "2021-06-03"))))
+
+    def test_flushes_at_max_rows(self):
+        sqlite = SqliteDriver(":memory:", check_same_thread=False)
+        with GroupCommitDriver(sqlite, delay_ms=10000, max_rows=2) as driver:
+            start = time.monotonic()
+            driver.add_entries("2021-06-01", ["a", "b"])
+            self.assertLess(time.monotonic() - start, 5)
+            self.assertEqual(["a", "b"], driver.get_entry("2021-06-01"))
+
+    def test_rejects_tags_the_driver_cannot_store(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, GroupCommitDriver(FsDriver(tmp_dir), delay_ms=0) as driver:
+            self.assertRaises(UnsupportedOperationException, driver.add_entry, "2021-06-01", "x", tag="incident")
+            self.assertFalse(driver.has_entry("2021-06-01"))
+            driver.add_entry("2021-06-01", "x")
+            self.assertEqual(["x\n"], driver.get_entry("2021-06-01"))
+
+    def test_errors_reach_the_caller(self):
+        sqlite = SqliteDriver(":memory:", check_same_thread=False)
+        with GroupCommitDriver(sqlite, delay_ms=0) as driver:
+            self.assertRaises(ValueError, driver.add_entry, "bogus", "x")
+
+
+class TestTransfer(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.fs = FsDriver(self.tmp_dir.name)
+        self.sqlite = SqliteDriver(":memory:")
+
+    def tearDown(self):
+        self.sqlite.close()
+        self.tmp_dir.cleanup()
+
+    def test_fs_to_sqlite(self):
+        self.fs.add_entries("2011-01-01", ["a", "b"])
+        self.fs.add_entries("2021-06-01", ["c", "d", "e"])
+        progress = []
+        self.assertEqual(5, transfer(self.fs, self.sqlite, batch_size=2, progress=progress.append))
+        self.assertEqual([2, 4, 5], progress)
+        self.assertEqual([("2011-01-01", ["a", "b"]), ("2021-06-01", ["c", "d", "e"])],
+                         list(self.sqlite.get_range("2000-01-01", "2030-01-01")))
+
+    def test_sqlite_to_fs(self):
+        self.sqlite.add_entries("2011-01-01", ["a", "b"], tag="x")
+        self.sqlite.add_entry("2021-06-01", "c")
+        self.assertEqual(3, transfer(self.sqlite, self.fs))
+        self.assertEqual(["a\n", "b\n"], self.fs.get_entry("2011-01-01"))
+        self.assertEqual(["2011-01-01", "2021-06-01"], FsDriver(self.tmp_dir.name)._list_dates())
+
+    def test_sqlite_to_sqlite_keeps_tags(self):
+        self.sqlite.add_entry("2021-06-01", "outage", tag="incident")
+        with SqliteDriver(":memory:") as target:
+            transfer(self.sqlite, target)
+            self.assertEqual([("2021-06-01", 1, "incident", "outage")], list(target.iter_rows("2021-06-01", "2021-06-01")))
+
+
+class TestAsyncDaily(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.daily = AsyncDaily(Daily(SqliteDriver(":memory:", check_same_thread=False)), chunk_size=2)
+
+    async def asyncTearDown(self):
+        await self.daily.close()
+
+    async def test_add_and_get(self):
+        await self.daily.add_entries("2021-06-01", ["a", "b"])
+        await self.daily.add_entry("2021-06-01", "c", tag="work")
+        result = await self.daily.get_entry("2021-06-01")
+        self.assertEqual(["a", "b", "c"], result.items)
+        self.assertEqual(["c"], (await self.daily.get_entry("2021-06-01", tag="work")).items)
+        self.assertEqual([(1, "a"), (2, "b"), (3, "c")], await self.daily.get_ids("2021-06-01"))
+
+    async def test_mutators(self):
+        await self.daily.add_entries("2021-06-01", ["a", "b"])
+        self.assertEqual(1, await self.daily.edit_entry("2021-06-01", 1, "x"))
+        self.assertEqual(1, await self.daily.remove_entry("2021-06-01", 2))
+        self.assertEqual(["x"], (await self.daily.get_entry("2021-06-01")).items)
+        self.assertEqual(1, await self.daily.nuke_entries("2021-06-01"))
+        self.assertFalse(await self.daily.has_entry("2021-06-01"))
+
+    async def test_get_range_streams_in_chunks(self):
+        for day in range(1, 6):
+            await self.daily.add_entry(f"2021-06-0{day}", str(day))
+        results = [(result.daily_date, result.items)
+                   async for result in self.daily.get_range("2021-06-01", "2021-06-05")]
+        self.assertEqual([(f"2021-06-0{day}", [str(day)]) for day in range(1, 6)], results)
+        rows = [row async for row in self.daily.iter_rows("2021-06-02", "2021-06-03")]
+        self.assertEqual([("2021-06-02", 2, "", "2"), ("2021-06-03", 3, "", "3")], rows)
+
+    async def test_invalid_range(self):
+        with self.assertRaises(IllegalDateException):
+            async for _ in self.daily.get_range("2021-06-05", "2021-06-01"):
+                pass
+
+    async def test_concurrent_adds(self):
+        driver = GroupCommitDriver(SqliteDriver(":memory:", check_same_thread=False), delay_ms=5)
+        async with AsyncDaily(Daily(driver)) as daily:
+            await asyncio.gather(*(daily.add_entry("2021-06-01", str(i)) for i in range(20)))
+            self.assertEqual(20, len((await daily.get_entry("2021-06-01")).items))
+
+    async def test_thread_bound_driver(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "daily.db")
+            async with AsyncDaily(lambda: Daily(SqliteDriver(filename))) as daily:
+                await daily.add_entry("2021-06-01", "a")
+                self.assertEqual(["a"], (await daily.get_entry("2021-06-01")).items)
+
+            with Daily(SqliteDriver(filename)) as sync_daily:
+                self.assertRaises(ValueError, AsyncDaily, sync_daily)
+
+    async def test_factory_of_thread_safe_driver_gets_a_pool(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "daily.db")
+            async with AsyncDaily(lambda: Daily(PooledSqliteDriver(filename)), workers=3) as daily:
+                self.assertEqual(3, daily._executor._max_workers)
+                await daily.add_entry("2021-06-01", "a")
+                self.assertTrue(await daily.has_entry("2021-06-01"))
+
+    async def test_fs_driver(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            async with AsyncDaily(Daily(FsDriver(tmp_dir))) as daily:
+                await daily.add_entries("2021-06-01", ["a", "b"])
+                self.assertEqual(["a\n", "b\n"], (await daily.get_entry("2021-06-01")).items)
+                self.assertEqual(["2021-06-01"], [result.daily_date async for result in
+                                                  daily.get_range("2021-06-01", "2021-06-30")])
+
+
+class TestHttpServer(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.driver = SqliteDriver(":memory:", check_same_thread=False)
+        self.daily = AsyncDaily(Daily(self.driver))
+        self.server = HttpServer(self.daily, port=0)
+        self.port = await self.server.start()
+        self.con = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+
+    async def asyncTearDown(self):
+        self.con.close()
+        await self.server.close()
+        await self.daily.close()
+
+    async def request(self, method, path, body=None, headers=None):
+        if body is not None:
+            headers = {"Content-Type": "application/json", **(headers or {})}
+
+        def send():
+            self.con.request(method, path, body=json.dumps(body) if body is not None else None,
+                             headers=headers or {})
+            response = self.con.getresponse()
+            payload = response.read()
+            return response.status, json.loads(payload) if payload else None, response.getheader("ETag")
+        return await asyncio.to_thread(send)
+
+    async def test_add_and_get(self):
+        status, body, _ = await self.request("POST", "/entries/2021-06-01", {"entries": ["a", "b"], "tag": "x"})
+        self.assertEqual((201, 2), (status, body["added"]))
+        status, body, etag = await self.request("GET", "/entries/2021-06-01?tag=x")
+        self.assertEqual((200, ["a", "b"]), (status, body["entries"]))
+        self.assertIsNotNone(etag)
+        sock = self.con.sock
+        status, body, _ = await self.request("GET", "/range?from=2021-05-31&to=2021-06-02")
+        self.assertEqual([{"date": "2021-06-01", "entries": ["a", "b"]}], body["days"])
+        status, body, _ = await self.request("GET", "/search?q=a")
+        self.assertEqual([{"date": "2021-06-01", "snippet": "[a]"}], body["results"])
+        self.assertIs(sock, self.con.sock)
+
+    async def test_unsupported_operations(self):
+        with mock.patch.object(self.driver, "search", side_effect=UnsupportedOperationException("no search")):
+            self.assertEqual((501, {"error": "no search"}), (await self.request("GET", "/search?q=a"))[:2])
+        # a bug that happens to raise NotImplementedError is not reported as a missing feature
+        with mock.patch.object(self.driver, "search", side_effect=NotImplementedError("bug")):
+            self.assertEqual(500, (await self.request("GET", "/search?q=a"))[0])
+
+    async def test_fs_entries_without_newlines(self):
+        await self.asyncTearDown()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.driver = FsDriver(tmp_dir.name)
+        self.daily = AsyncDaily(Daily(self.driver))
+        self.server = HttpServer(self.daily, port=0)
+        self.port = await self.server.start()
+        self.con = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        await self.request("POST", "/entries/2021-06-01", {"entries": ["a", "b"]})
+        _, body, _ = await self.request("GET", "/entries/2021-06-01")
+        self.assertEqual(["a", "b"], body["entries"])
+        _, body, _ = await self.request("GET", "/range?from=2021-06-01&to=2021-06-01")
+        self.assertEqual([{"date": "2021-06-01", "entries": ["a", "b"]}], body["days"])
+
+    async def test_conditional_get(self):
+        await self.request("POST", "/entries/2021-06-01", {"entries": ["a"]})
+        _, _, etag = await self.request("GET", "/entries/2021-06-01")
+        with mock.patch.object(self.driver, "iter_entry") as iter_entry:
+            status, body, _ = await self.request("GET", "/entries/2021-06-01", headers={"If-None-Match": etag})
+            iter_entry.assert_not_called()
+        self.assertEqual((304, None), (status, body))
+
+        await self.request("POST", "/entries/2021-06-01", {"entries": ["b"]})
+        status, body, new_etag = await self.request("GET", "/entries/2021-06-01", headers={"If-None-Match": etag})
+        self.assertEqual((200, ["a", "b"]), (status, body["entries"]))
+        self.assertNotEqual(etag, new_etag)
+
+    async def test_errors(self):
+        self.assertEqual(400, (await self.request("GET", "/entries/bogus"))[0])
+        self.assertEqual(400, (await self.request("GET", "/range"))[0])
+        self.assertEqual(400, (await self.request("GET", "/search?q=%22"))[0])
+        self.assertEqual(400, (await self.request("POST", "/entries/2021-06-01", {"entries": [1]}))[0])
+        self.assertEqual(404, (await self.request("GET", "/nothing"))[0])
+        self.assertEqual(405, (await self.request("DELETE", "/entries/2021-06-01"))[0])
+
+    async def test_metrics(self):
+        self.driver.retry_metrics.retries = 3
+        status, body, etag = await self.request("GET", "/metrics")
+        self.assertEqual((200, None), (status, etag))
+        self.assertEqual({"retries": 3, "failures": 0, "wait_seconds": 0.0}, body)
+
+    async def test_rejects_cross_origin_requests(self):
+        plain = {"Content-Type": "text/plain"}
+        self.assertEqual(415, (await self.request("POST", "/entries/2021-06-01", {"entries": ["a"]}, plain))[0])
+        evil_origin = {"Origin": "https://evil.example"}
+        self.assertEqual(403, (await self.request("POST", "/entries/2021-06-01", {"entries": ["a"]}, evil_origin))[0])
+        self.assertEqual(403, (await self.request("GET", "/entries/2021-06-01", headers={"Host": "evil.example"}))[0])
+        self.assertFalse(self.driver.has_entry("2021-06-01"))
+
+        own_origin = {"Origin": f"http://localhost:{self.port}"}
+        self.assertEqual(201, (await self.request("POST", "/entries/2021-06-01", {"entries": ["a"]}, own_origin))[0])
+
+
+class TestDaemon(TestCase):
+    def test_forward_to_daemon(self):
+        config = load_config(os.devnull, environ={})
+        own = driver_config(config)
+        config["daily"]["driver"] = "fs"
+        other = driver_config(config)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            socket_path = os.path.join(tmp_dir, "daily.sock")
+            driver = GroupCommitDriver(SqliteDriver(":memory:", check_same_thread=False))
+            with Daily(driver) as daily, DaemonServer(socket_path, daily, own) as server:
+                thread = threading.Thread(target=server.serve_forever)
+                thread.start()
+                try:
+                    self.assertEqual(("", 0), forward_to_daemon(socket_path, ["-d", "2021-06-01", "add", "-m", "x"],
+                                                                False, own))
+                    self.assertEqual(("- x\n", 0), forward_to_daemon(socket_path, ["-d", "2021-06-01", "get"], False,
+                                                                     own))
+                    self.assertEqual(1, forward_to_daemon(socket_path, ["-d", "bogus", "get"], False, own)[1])
+                    self.assertIsNone(forward_to_daemon(socket_path, ["-d", "2021-06-01", "get"], False, other))
+                finally:
+                    server.shutdown()
+                    thread.join()
+
+    def test_forward_without_daemon(self):
+        self.assertIsNone(forward_to_daemon("/nonexistent/daily.sock", ["get"], False, {}))
+
+    def test_forward_to_hung_daemon(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            socket_path = os.path.join(tmp_dir, "daily.sock")
+            sock.bind(socket_path)
+            sock.listen()
+            start = time.monotonic()
+            self.assertIsNone(forward_to_daemon(socket_path, ["get"], False, {}, timeout=0.1))
+            self.assertLess(time.monotonic() - start, 1)
+
+
+    def test_forward_never_falls_back_after_sending(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            socket_path = os.path.join(tmp_dir, "daily.sock")
+            sock.bind(socket_path)
+            sock.listen()
+
+            def crash():
+                # greets and reads the command, then dies before answering
+                connection, _ = sock.accept()
+                with connection:
+                    connection.sendall(b"ready\n")
+                    time.sleep(0.2)
+                    connection.recv(65536)
+
+            thread = threading.Thread(target=crash)
+            thread.start()
+            try:
+                with self.assertRaises(ConnectionError):
+                    forward_to_daemon(socket_path, ["add", "-m", "x"], False, {}, timeout=0.1)
+            finally:
+                thread.join()
+
+class TestSqliteDriver(TestCase):
+    def setUp(self):
+        self.driver = SqliteDriver(":memory:")
+
+    def tearDown(self):
+        self.driver.close()
+
+    def test_multiple_mutations(self):
+        self.driver.add_entry("2021-06-01", "first")
+        self.driver.add_entry("2021-06-01", "second")
+        entry_id = self.driver.get_ids("2021-06-01")[0][0]
+        self.assertEqual(1, self.driver.edit_entry("2021-06-01", entry_id, "edited"))
+        self.assertEqual(["edited", "second"], self.driver.get_entry("2021-06-01"))
+        self.assertEqual(1, self.driver.remove_entry("2021-06-01", entry_id))
+        self.assertEqual(1, self.driver.nuke_entries("2021-06-01"))
+
+    def test_add_entries(self):
+        self.driver.add_entry("2021-06-01", "first")
+        self.driver.add_entries("2021-06-01", ["second", "third"])
+        self.assertEqual(["first", "second", "third"], self.driver.get_entry("2021-06-01"))
+
+    def test_profile_fast(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with SqliteDriver(os.path.join(tmp_dir, "daily.db"), profile="fast") as driver:
+                cursor = driver._con.cursor()
+                self.assertEqual("wal", cursor.execute('PRAGMA journal_mode').fetchone()[0])
+                self.assertEqual(1, cursor.execute('PRAGMA synchronous').fetchone()[0])
+
+    def test_profile_unknown(self):
+        self.assertRaises(ValueError, SqliteDriver, ":memory:", profile="yolo")
+
+    def test_get_range(self):
+        self.driver.add_entries("2021-06-01", ["a", "b"])
+        self.driver.add_entry("2021-06-03", "c")
+        self.driver.add_entry("2021-07-01", "d")
+        self.assertEqual([("2021-06-01", ["a", "b"]), ("2021-06-03", ["c"])],
+                         list(self.driver.get_range("2021-06-01", "2021-06-30")))
+
+    def test_search(self):
+        self.driver.add_entry("2021-06-01", "fixed the TLS certificate rotation")
+        self.driver.add_entry("2021-06-02", "reviewed pull requests")
+        self.assertEqual([("2021-06-01", "fixed the [TLS] certificate rotation")], self.driver.search("tls"))
+
+    def test_search_follows_edits(self):
+        self.driver.add_entry("2021-06-01", "fixed the TLS thing")
+        entry_id = self.driver.get_ids("2021-06-01")[0][0]
+        self.driver.edit_entry("2021-06-01", entry_id, "fixed the DNS thing")
+        self.assertEqual([], self.driver.search("tls"))
+        self.assertEqual(1, len(self.driver.search("dns")))
+        self.driver.remove_entry("2021-06-01", entry_id)
+        self.assertEqual([], self.driver.search("dns"))
+
+    def test_search_backfills_existing_entries(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "daily.db")
+            con = sqlite3.connect(filename)
+            con.execute('CREATE TABLE daily (id INTEGER PRIMARY KEY, date INTEGER, desc TEXT, tag TEXT)')
+            con.execute('INSERT INTO daily VALUES (NULL, 20210601, "legacy entry", "")')
+            con.commit()
+            con.close()
+            with SqliteDriver(filename) as driver:
+                self.assertEqual([("2021-06-01", "[legacy] entry")], driver.search("legacy"))
+
+    def test_iter_entry_small_arraysize(self):
+        with SqliteDriver(":memory:", arraysize=2) as driver:
+            driver.add_entries("2021-06-01", ["a", "b", "c", "d", "e"])
+            entries = driver.iter_entry("2021-06-01")
+            self.assertEqual("a", next(entries))
+            self.assertEqual(["b", "c", "d", "e"], list(entries))
+            self.assertEqual(["a", "b", "c", "d", "e"], [desc for _, desc in driver.iter_ids("2021-06-01")])
+
+    def test_tags(self):
+        self.driver.add_entries("2021-06-01", ["outage", "postmortem"], tag="incident")
+        self.driver.add_entry("2021-06-01", "reviews")
+        self.driver.add_entry("2021-06-02", "more reviews")
+        self.driver.add_entry("2021-09-01", "another outage", tag="incident")
+        self.assertEqual(["outage", "postmortem", "reviews"], self.driver.get_entry("2021-06-01"))
+        self.assertEqual(["outage", "postmortem"], list(self.driver.iter_entry("2021-06-01", tag="incident")))
+        self.assertEqual([("2021-06-01", ["outage", "postmortem"])],
+                         list(self.driver.get_range("2021-04-01", "2021-06-30", tag="incident")))
+
+    def test_tag_query_uses_index(self):
+        plan = self.driver._con.execute('EXPLAIN QUERY PLAN SELECT desc FROM daily '
+                                        'WHERE tag = ? AND date BETWEEN ? AND ?', ("x", 1, 2)).fetchall()
+        self.assertIn("tag_date", plan[0][-1])
+
+    def test_schema_version(self):
+        version = self.driver._con.execute('PRAGMA user_version').fetchone()[0]
+        self.assertEqual(len(SQLITE_MIGRATIONS), version)
+
+    def test_no_ddl_when_schema_is_current(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "daily.db")
+            SqliteDriver(filename).close()
+            statements = []
+            con = sqlite3.connect(filename)
+            con.set_trace_callback(statements.append)
+            driver = SqliteDriver.__new__(SqliteDriver)
+            driver._con = con
+            driver._init_db()
+            con.close()
+            self.assertEqual(['PRAGMA user_version'], statements)
+
+    def test_context_manager_closes(self):
+        with SqliteDriver(":memory:") as driver:
+            driver.add_entry("2021-06-01", "entry")
+        self.assertRaises(sqlite3.ProgrammingError, driver.has_entry, "2021-06-01")
+
+    def test_latest_date_empty(self):
+        self.assertIsNone(self.driver.latest_date())
+
+    def test_latest_date(self):
+        self.driver.add_entry("2019-03-01", "old")
+        self.driver.add_entry("2021-06-01", "new")
+        self.assertEqual("2021-06-01", self.driver.latest_date())
+        self.assertEqual("2019-03-01", self.driver.latest_date(before="2021-05-31"))
+        self.assertIsNone(self.driver.latest_date(before="2019-02-28"))
+
+
+class TestFsDriver(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.driver = FsDriver(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_latest_date_empty(self):
+        self.assertIsNone(self.driver.latest_date())
+
+    def run_cli(self, argv):
+        output = io.StringIO()
+        ui = Tui(color=False, stream=output)
+        code = execute(Daily(self.driver), ui, parse_args(argv))
+        ui._flush()
+        return code, output.getvalue()
+
+    def test_search_is_reported_as_unsupported(self):
+        self.assertEqual((0, "full-text search is not supported by the fs driver\n"), self.run_cli(["search", "foo"]))
+
+    def test_tags_are_reported_as_unsupported(self):
+        message = "tags are not supported by the fs driver\n"
+        self.assertEqual((0, message), self.run_cli(["add", "-t", "x", "-m", "entry"]))
+        self.assertEqual((0, message), self.run_cli(["get", "-t", "x"]))
+        self.assertEqual((0, message), self.run_cli(["get", "-t", "x", "--from", "2021-06-01"]))
+        self.assertIsNone(self.driver.latest_date())
+
+    def test_latest_date(self):
+        self.driver.add_entry("2019-03-01", "old")
+        self.driver.add_entry("2021-06-01", "new")
+        self.assertEqual("2021-06-01", self.driver.latest_date())
+        self.assertEqual("2019-03-01", self.driver.latest_date(before="2021-05-31"))
+        self.assertIsNone(self.driver.latest_date(before="2019-02-28"))
+
+    def test_add_entries(self):
+        self.driver.add_entry("2021-06-01", "first")
+        self.driver.add_entries("2021-06-01", ["second", "third"])
+        self.assertEqual(["first\n", "second\n", "third\n"], self.driver.get_entry("2021-06-01"))
+
+    def test_get_range(self):
+        self.driver.add_entries("2021-06-01", ["a", "b"])
+        self.driver.add_entry("2021-06-03", "c")
+        self.driver.add_entry("2021-07-01", "d")
+        self.assertEqual([("2021-06-01", ["a\n", "b\n"]), ("2021-06-03", ["c\n"])],
+                         list(self.driver.get_range("2021-06-01", "2021-06-30")))
+
+    def test_tags_unsupported(self):
+        self.assertRaises(UnsupportedOperationException, self.driver.add_entry, "2021-06-01", "outage", tag="incident")
+
+    def test_get_ids(self):
+        self.driver.add_entries("2021-06-01", ["a", "b"])
+        self.assertEqual([(1, "a"), (2, "b")], self.driver.get_ids("2021-06-01"))
+        self.assertEqual([], self.driver.get_ids("2021-06-02"))
+
+    def test_edit_entry(self):
+        self.driver.add_entries("2021-06-01", ["a", "b", "c"])
+        self.assertEqual(1, self.driver.edit_entry("2021-06-01", "2", "edited"))
+        self.assertEqual(["a\n", "edited\n", "c\n"], self.driver.get_entry("2021-06-01"))
+        self.assertEqual(0, self.driver.edit_entry("2021-06-01", 4, "missing"))
+        self.assertEqual([], [f for f in os.listdir(self.tmp_dir.name) if f.endswith(".tmp")])
+
+    def test_remove_entry(self):
+        self.driver.add_entries("2021-06-01", ["a", "b"])
+        self.assertEqual(1, self.driver.remove_entry("2021-06-01", 1))
+        self.assertEqual(["b\n"], self.driver.get_entry("2021-06-01"))
+        self.assertEqual(1, self.driver.remove_entry("2021-06-01", 1))
+        self.assertFalse(self.driver.has_entry("2021-06-01"))
+        self.assertEqual(0, self.driver.remove_entry("2021-06-01", 1))
+
+    def test_index_tracks_writes(self):
+        self.driver.add_entries("2021-06-01", ["a", "b"])
+        self.driver.add_entry("2021-06-02", "c")
+        self.driver.remove_entry("2021-06-02", 1)
+        self.assertEqual({"2021-06-01": 2}, {d: lines for d, (lines, _) in self.driver._get_index().items()})
+        index, _, _ = self.driver._read_index()
+        self.assertEqual(self.driver._get_index(), index)
+
+    def test_index_served_without_touching_files(self):
+        self.driver.add_entry("2021-06-01", "a")
+        other = FsDriver(self.tmp_dir.name)
+        with mock.patch.object(FsDriver, "_rebuild_index", side_effect=AssertionError("rebuilt")):
+            self.assertTrue(other.has_entry("2021-06-01"))
+            self.assertEqual("2021-06-01", other.latest_date())
+
+    def test_index_picks_up_external_changes(self):
+        self.driver.add_entry("2021-06-01", "a")
+        self.assertFalse(self.driver.has_entry("2021-06-02"))
+        with open(os.path.join(self.tmp_dir.name, "2021-06-02.txt"), "w") as entries_file:
+            entries_file.write("external\n")
+        os.remove(os.path.join(self.tmp_dir.name, "2021-06-01.txt"))
+        self.assertEqual(["2021-06-02"], self.driver._list_dates())
+        self.assertEqual((1, os.stat(os.path.join(self.tmp_dir.name, "2021-06-02.txt")).st_mtime_ns),
+                         self.driver._get_index()["2021-06-02"])
+
+    def test_add_never_truncates_unindexed_files(self):
+        self.driver.add_entry("2021-06-01", "a")
+        dir_stat = os.stat(self.tmp_dir.name)
+        with open(os.path.join(self.tmp_dir.name, "2021-06-02.txt"), "w") as entries_file:
+            entries_file.write("external\n")
+        # hides the new file from the index, like a change within the mtime granularity would
+        os.utime(self.tmp_dir.name, ns=(dir_stat.st_atime_ns, dir_stat.st_mtime_ns))
+        self.assertFalse(self.driver.has_entry("2021-06-02"))
+        self.driver.add_entry("2021-06-02", "b")
+        with open(os.path.join(self.tmp_dir.name, "2021-06-02.txt")) as entries_file:
+            self.assertEqual("external\nb\n", entries_file.read())
+
+    def test_concurrent_writers_keep_the_index_complete(self):
+        def write(offset):
+            driver = FsDriver(self.tmp_dir.name)
+            for day in range(offset, 28, 2):
+                driver.add_entry(f"2021-06-{day + 1:02d}", "x")
+
+        threads = [threading.Thread(target=write, args=(offset,)) for offset in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        index, _, _ = self.driver._read_index()
+        self.assertEqual([f"2021-06-{day:02d}" for day in range(1, 29)], sorted(index))
+
+    def test_sharded_layout(self):
+        driver = FsDriver(self.tmp_dir.name, layout="sharded")
+        driver.add_entries("2021-06-01", ["a", "b"])
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, "2021", "06", "01.txt")))
+        self.assertEqual(["a\n", "b\n"], driver.get_entry("2021-06-01"))
+        self.assertEqual(1, driver.remove_entry("2021-06-01", 1))
+        self.assertEqual([("2021-06-01", ["b\n"])], list(driver.get_range("2021-01-01", "2021-12-31")))
+
+    def test_sharded_index_picks_up_changes_within_a_month(self):
+        driver = FsDriver(self.tmp_dir.name, layout="sharded")
+        driver.add_entry("2021-06-01", "a")
+        self.assertFalse(driver.has_entry("2021-06-02"))
+        with open(os.path.join(self.tmp_dir.name, "2021", "06", "02.txt"), "w") as entries_file:
+            entries_file.write("external\n")
+        self.assertTrue(FsDriver(self.tmp_dir.name, layout="sharded").has_entry("2021-06-02"))
+        self.assertTrue(driver.has_entry("2021-06-02"))
+        os.remove(os.path.join(self.tmp_dir.name, "2021", "06", "01.txt"))
+        self.assertEqual(["2021-06-02"], driver._list_dates())
+
+    def test_get_range_skips_vanished_days(self):
+        driver = FsDriver(self.tmp_dir.name, layout="sharded")
+        driver.add_entry("2021-06-01", "a")
+        driver.add_entry("2021-06-02", "b")
+        month = os.path.join(self.tmp_dir.name, "2021", "06")
+        month_stat = os.stat(month)
+        os.remove(os.path.join(month, "01.txt"))
+        # hides the deletion from the index, like a change within the mtime granularity would
+        os.utime(month, ns=(month_stat.st_atime_ns, month_stat.st_mtime_ns))
+        self.assertEqual([("2021-06-02", ["b\n"])], list(driver.get_range("2021-06-01", "2021-06-30")))
+        self.assertEqual(["2021-06-02"], [row[0] for row in driver.iter_rows("2021-06-01", "2021-06-30")])
+
+    def test_reads_both_layouts(self):
+        self.driver.add_entry("2021-06-01", "flat")
+        driver = FsDriver(self.tmp_dir.name, layout="sharded")
+        driver.add_entry("2021-06-02", "sharded")
+        driver.add_entry("2021-06-01", "appended")
+        self.assertEqual(["flat\n", "appended\n"], driver.get_entry("2021-06-01"))
+        self.assertEqual(["sharded\n"], self.driver.get_entry("2021-06-02"))
+        self.assertEqual(["2021-06-01", "2021-06-02"], FsDriver(self.tmp_dir.name)._list_dates())
+
+    def test_migrate_layout(self):
+        self.driver.add_entries("2021-06-01", ["a", "b"])
+        self.driver.add_entry("2022-01-31", "c")
+        self.assertEqual(2, self.driver.migrate_layout("sharded"))
+        self.assertEqual(["2021", "2022"], sorted(f for f in os.listdir(self.tmp_dir.name) if not f.startswith(".")))
+        self.assertEqual(["a\n", "b\n"], self.driver.get_entry("2021-06-01"))
+        self.assertEqual(0, self.driver.migrate_layout("sharded"))
+        self.assertEqual(2, self.driver.migrate_layout("flat"))
+        self.assertEqual(["2021-06-01.txt", "2022-01-31.txt"],
+                         sorted(f for f in os.listdir(self.tmp_dir.name) if not f.startswith(".")))